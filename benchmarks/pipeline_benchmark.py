@@ -0,0 +1,253 @@
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+from model.dictionary_exporter.dictionary_exporter import export_dictionary, export_formats
+from model.dictionary_store.dictionary_store import DictionaryStore, POS_PROPERTY, CASE_PROPERTY, \
+    NORMAL_FORM_PROPERTY
+from model.dictionary_handler.dictionary_handler import DictionaryHandler, SEARCH_BY_LEXEME, SEARCH_BY_POS, \
+    SEARCH_BY_CASE, SEARCH_BY_NORMAL_FORM, SEARCH_BY_WORDFORM, SEARCH_BY_STEM, SEARCH_BY_PREFIX, SEARCH_FUZZY, \
+    FUZZY_MAX_DISTANCE
+from model.document_handler.document_handler import DocumentHandler, count_pdf_pages, list_pdf_pages
+from model.lexeme_handler.lexeme_handler import analyze_lexeme_paradigms
+from model.morphology_handler.morphology_handler import get_morphology_handler
+
+DEFAULT_DOCUMENTS = ["test_short.pdf", "test.pdf", "test_long.pdf"]
+RESULTS_FORMAT_VERSION = 2
+
+_long_word = re.compile(r"\b[^\W\d_]{4,}")
+_syllables = ["ба", "ве", "ги", "до", "жу", "зы", "ка", "ле", "ми", "но",
+              "пу", "ры", "са", "те", "фи", "хо", "цу", "ча", "ше", "щи"]
+
+
+class TextDocument(DocumentHandler):
+    # документ из готовых страниц текста, чтобы разбор измерялся отдельно от извлечения из PDF
+    def __init__(self, name: str, pages: List[str]):
+        super().__init__(name)
+        self._pages = pages
+
+    def iter_pdf_text(self, file_path: str, workers: int = 1):
+        return iter(self._pages)
+
+
+def measure(results: List[Dict], corpus: str, stage: str, function: Callable[[], object], items: int,
+            repeat: int = 1, prepare: Optional[Callable[[], None]] = None):
+    seconds = None
+    value = None
+    for _ in range(repeat):
+        if prepare:
+            prepare()
+        start = time.perf_counter()
+        value = function()
+        elapsed = time.perf_counter() - start
+        seconds = elapsed if seconds is None else min(seconds, elapsed)
+    # пиковая память этапа - в отдельном прогоне, так как tracemalloc замедляет выделение памяти;
+    # учитывается только основной процесс, память процессов разбора сюда не входит
+    value = None
+    if prepare:
+        prepare()
+    tracemalloc.start()
+    try:
+        value = function()
+        peak = tracemalloc.get_traced_memory()[1] / (1 << 20)
+    finally:
+        tracemalloc.stop()
+    results.append({"corpus": corpus, "stage": stage, "items": items, "seconds": round(seconds, 6),
+                    "throughput": round(items / seconds, 2) if seconds else None,
+                    "peak_memory_mb": round(peak, 2)})
+    print(f"{corpus:<20} {stage:<20} {items:>8} {seconds:>10.4f} с {peak:>8.2f} МБ", file=sys.stderr)
+    return value
+
+
+def scale_pages(pages: List[str], scale: int) -> List[str]:
+    # копия номер N получает у каждого знаменательного слова свою приставку из слогов, чтобы словарь рос
+    # вместе с текстом; слова, для которых анализатор не определит часть речи, остаются как есть
+    analyzer = get_morphology_handler()
+
+    def add_prefix(match) -> str:
+        word = prefix + match.group()
+        return word if analyzer.parse(word.lower())[0].tag.POS else match.group()
+
+    scaled = list(pages)
+    for number in range(1, scale):
+        prefix = _encode_number(number)
+        scaled.extend(_long_word.sub(add_prefix, page) for page in pages)
+    return scaled
+
+
+def _encode_number(number: int) -> str:
+    prefix = ""
+    while number:
+        number, digit = divmod(number, len(_syllables))
+        prefix = _syllables[digit] + prefix
+    return prefix
+
+
+def make_queries(store: DictionaryStore, count: int, seed: int) -> Dict[str, List[str]]:
+    entries = store.get_entries()
+    sample = [next(iter(entries[position]))
+              for position in random.Random(seed).sample(range(len(entries)), min(count, len(entries)))]
+    wordforms = [wordform for lexeme in sample for wordform in store.get_paradigm(lexeme)[:1] if wordform]
+    return {
+        SEARCH_BY_LEXEME: sample,
+        SEARCH_BY_POS: [store.get(lexeme).get(POS_PROPERTY, "") for lexeme in sample],
+        SEARCH_BY_CASE: [store.get(lexeme).get(CASE_PROPERTY, "") for lexeme in sample],
+        SEARCH_BY_NORMAL_FORM: [store.get(lexeme).get(NORMAL_FORM_PROPERTY, "") for lexeme in sample],
+        SEARCH_BY_WORDFORM: wordforms,
+        SEARCH_BY_STEM: sample,
+        SEARCH_BY_PREFIX: [lexeme[:3] for lexeme in sample],
+        SEARCH_FUZZY: [lexeme[:1] + lexeme[2:] for lexeme in sample],
+    }
+
+
+def get_searches(store: DictionaryStore) -> Dict[str, Callable[[str], object]]:
+    return {
+        SEARCH_BY_LEXEME: store.get,
+        SEARCH_BY_POS: store.get_by_pos,
+        SEARCH_BY_CASE: store.get_by_case,
+        SEARCH_BY_NORMAL_FORM: store.get_by_normal_form,
+        SEARCH_BY_WORDFORM: store.find_wordform,
+        SEARCH_BY_STEM: store.find_stem,
+        SEARCH_BY_PREFIX: store.find_prefix,
+        SEARCH_FUZZY: lambda query: store.find_similar(query, FUZZY_MAX_DISTANCE),
+    }
+
+
+def run_queries(search: Callable[[str], object], queries: List[str]):
+    for query in queries:
+        search(query)  # результаты не сохраняются, чтобы не завышать пиковую память
+
+
+def build_store(structures: List[Dict], paradigms: List[List[str]]) -> DictionaryStore:
+    store = DictionaryStore()
+    store.extend(structures, paradigms)
+    return store
+
+
+def run_corpus(results: List[Dict], corpus: str, pages: List[str], args, path: Optional[str] = None):
+    # path - PDF корпуса; у синтетических корпусов его нет, и при добавлении текст берётся из готовых страниц
+    analyzer = get_morphology_handler()
+    tokens = sum(len(page.split()) for page in pages)
+    document = TextDocument(corpus, pages)
+    lexemes = measure(results, corpus, "tokenize", document.get_lexems, tokens, args.repeat, analyzer.clear_cache)
+    structures, paradigms = measure(results, corpus, "analyze",
+                                    lambda: analyze_lexeme_paradigms(lexemes, args.workers),
+                                    len(lexemes), args.repeat, analyzer.clear_cache)
+    store = measure(results, corpus, "build", lambda: build_store(structures, paradigms), len(structures),
+                    args.repeat)
+    base_handler = None
+
+    def prepare_append():
+        # добавление к словарю первого документа тем же путём, что в окне программы и командной строке:
+        # извлечение, отбор лексем, разбор только новых и запись в хранилище
+        nonlocal base_handler
+        base_handler = DictionaryHandler(args.documents[0], use_cache=False, workers=args.workers)
+        analyzer.clear_cache()
+
+    measure(results, corpus, "append", lambda: base_handler.add_documents([path or TextDocument(corpus, pages)]),
+            len(lexemes), args.repeat, prepare_append)
+
+    if not len(store):
+        return
+    queries = make_queries(store, args.queries, args.seed)
+    for kind, search in get_searches(store).items():
+        measure(results, corpus, "search_" + kind, lambda: run_queries(search, queries[kind]),
+                len(queries[kind]), args.repeat)
+    with tempfile.TemporaryDirectory() as directory:
+        for export_format in args.formats:
+            path = os.path.join(directory, "dictionary." + export_format)
+            measure(results, corpus, "export_" + export_format, lambda: export_dictionary(store, path, export_format),
+                    len(store), args.repeat)
+
+
+def run_benchmarks(args) -> List[Dict]:
+    results = []
+    document_pages = {}
+    for path in args.documents:
+        name = os.path.basename(path)
+        document_pages[name] = measure(results, name, "extract", lambda: list_pdf_pages(path),
+                                       count_pdf_pages(path), args.repeat)
+
+    for path in args.documents:
+        name = os.path.basename(path)
+        run_corpus(results, name, document_pages[name], args, path)
+
+    scale_base = os.path.basename(args.scale_base)
+    base_pages = document_pages.get(scale_base) or list_pdf_pages(args.scale_base)
+    for scale in args.scales:
+        run_corpus(results, f"{scale_base}x{scale}", scale_pages(base_pages, scale), args)
+    return results
+
+
+def compare_results(results: List[Dict], previous: List[Dict], threshold: float, min_seconds: float) -> List[Dict]:
+    previous_seconds = {(result["corpus"], result["stage"]): result["seconds"] for result in previous}
+    regressions = []
+    for result in results:
+        before = previous_seconds.get((result["corpus"], result["stage"]))
+        if before is None:
+            continue
+        result["previous_seconds"] = before
+        result["change"] = round(result["seconds"] / before - 1, 4) if before else None
+        if result["seconds"] - before > min_seconds and result["seconds"] > before * (1 + threshold):
+            regressions.append(result)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замеры этапов построения словаря")
+    parser.add_argument("documents", nargs="*", default=DEFAULT_DOCUMENTS)
+    parser.add_argument("--scale-base", default="test_long.pdf", help="документ для синтетических корпусов")
+    parser.add_argument("--scales", type=int, nargs="*", default=[10, 100],
+                        help="во сколько раз синтетический корпус больше исходного документа")
+    parser.add_argument("--formats", nargs="*", choices=export_formats, default=export_formats)
+    parser.add_argument("--queries", type=int, default=200, help="число запросов каждого типа поиска")
+    parser.add_argument("--workers", type=int, default=1, help="число процессов для разбора лексем")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="повторы этапа, в результат идёт лучшее время; при одном замере --compare ловит шум")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="файл результатов предыдущего запуска")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="допустимое относительное замедление этапа")
+    parser.add_argument("--min-seconds", type=float, default=0.05,
+                        help="замедления меньше этого числа секунд не считаются регрессией")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args)
+    regressions = []
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as previous_file:
+            previous = json.load(previous_file)["results"]
+        regressions = compare_results(results, previous, args.threshold, args.min_seconds)
+
+    report = {
+        "version": RESULTS_FORMAT_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "analyzer": get_morphology_handler().get_version(),
+        "settings": {"scales": args.scales, "workers": args.workers, "repeat": args.repeat,
+                     "queries": args.queries, "seed": args.seed},
+        "results": results,
+        "regressions": [(result["corpus"], result["stage"]) for result in regressions],
+    }
+    with open(args.output, "w", encoding="utf-8") as output_file:
+        json.dump(report, output_file, ensure_ascii=False, indent=1)
+
+    for result in regressions:
+        print(f"регрессия: {result['corpus']} {result['stage']} {result['previous_seconds']:.4f} с -> "
+              f"{result['seconds']:.4f} с ({result['change']:+.0%})", file=sys.stderr)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from model.dictionary_exporter.dictionary_exporter import LEXEME_FIELD
+from model.lexeme_handler.lexeme_handler import cases_representation
+from server import DEFAULT_HOST, DEFAULT_PORT
+
+ENDPOINTS = ["analyze", "wordform", "search", "mixed"]
+DEFAULT_WORDS = ["дом", "книга", "словарь", "документ", "система", "анализ", "лексема", "значение", "работа",
+                 "программа", "задача", "пример", "текст", "слово", "форма", "время", "человек", "вопрос"]
+
+
+class Connection:
+    # одно keep-alive соединение со службой
+    def __init__(self, host: str, port: int):
+        self._host = host
+        self._port = port
+        self._reader = None
+        self._writer = None
+
+    async def request(self, method: str, target: str, payload: Optional[Dict] = None) -> Tuple[int, Dict]:
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self._host, self._port)
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8") if payload is not None else b""
+        head = "{} {} HTTP/1.1\r\nHost: {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\n\r\n".format(
+            method, target, self._host, len(body))
+        self._writer.write(head.encode("latin-1") + body)
+        await self._writer.drain()
+        status = int((await self._reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self._reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value)
+        return status, json.loads(await self._reader.readexactly(length))
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            await self._writer.wait_closed()
+            self._writer = None
+
+
+def make_request(endpoint: str, words: List[str], generator: random.Random) -> Tuple[str, str, Optional[Dict]]:
+    if endpoint == "mixed":
+        endpoint = generator.choice(ENDPOINTS[:-1])
+    word = generator.choice(words)
+    if endpoint == "analyze":
+        return "POST", "/analyze", {"lexeme": word}
+    if endpoint == "wordform":
+        return "POST", "/wordform", {"lexeme": word, "case": generator.choice(list(cases_representation.values())),
+                                     "singular": generator.random() < 0.5}
+    return "GET", "/search?q=" + quote(word[:-1] + "*"), None  # поиск по началу слова
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def run_client(connection: Connection, endpoint: str, words: List[str], requests: List[int],
+                     generator: random.Random, latencies: List[float], errors: Dict[int, int]):
+    while requests:
+        requests.pop()
+        method, target, payload = make_request(endpoint, words, generator)
+        start = time.perf_counter()
+        status, _ = await connection.request(method, target, payload)
+        latencies.append(time.perf_counter() - start)
+        if status != 200:
+            errors[status] = errors.get(status, 0) + 1
+
+
+async def run_load(args) -> Dict:
+    connections = [Connection(args.host, args.port) for _ in range(args.concurrency)]
+    words = args.words or DEFAULT_WORDS
+    if not args.words:
+        # лексемы из словаря службы, если он уже построен
+        status, top = await connections[0].request("GET", "/top?n={}".format(args.vocabulary))
+        if status == 200 and top["results"]:
+            words = [record[LEXEME_FIELD] for record in top["results"]]
+    requests = list(range(args.requests))
+    latencies = []
+    errors = {}
+    generator = random.Random(args.seed)
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(run_client(connection, args.endpoint, words, requests, generator, latencies, errors)
+                               for connection in connections))
+    finally:
+        elapsed = time.perf_counter() - start
+        await asyncio.gather(*(connection.close() for connection in connections))
+    _, statistics = await connections[0].request("GET", "/stats")
+    await connections[0].close()
+    return {
+        "endpoint": args.endpoint,
+        "concurrency": args.concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(elapsed, 4),
+        "requests_per_second": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "max_ms": round(max(latencies) * 1000, 3),
+        "batching": statistics.get("batching"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочная проверка локальной службы словаря (server.py)")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--endpoint", choices=ENDPOINTS, default="analyze")
+    parser.add_argument("-c", "--concurrency", type=int, default=32, help="число одновременных клиентов")
+    parser.add_argument("-n", "--requests", type=int, default=2000, help="общее число запросов")
+    parser.add_argument("--vocabulary", type=int, default=500, help="сколько лексем словаря брать для запросов")
+    parser.add_argument("--words", nargs="*", help="лексемы для запросов вместо лексем словаря")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="файл для результатов в JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_load(args))
+    print(f"{report['endpoint']}: {report['requests']} запросов за {report['seconds']:.2f} с, "
+          f"{report['requests_per_second']:.1f} запр/с, p50 {report['p50_ms']:.2f} мс, "
+          f"p99 {report['p99_ms']:.2f} мс, ошибок {sum(report['errors'].values())}", file=sys.stderr)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(report, output_file, ensure_ascii=False, indent=1)
+
+
+if __name__ == "__main__":
+    main()
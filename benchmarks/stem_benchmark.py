@@ -0,0 +1,61 @@
+import argparse
+import time
+from typing import List
+
+from model.document_handler.document_handler import DocumentHandler
+from model.lexeme_handler.lexeme_handler import LexemeHandler, find_common_stem
+
+
+def naive_common_stem(forms: List[str]) -> str:
+    # прежний перебор всех подстрок первой формы
+    if not forms or len(forms[0]) == 0:
+        return ""
+    stem = ""
+    for i in range(len(forms[0])):
+        for j in range(len(forms[0]) - i + 1):
+            if j > len(stem) and all(forms[0][i:i + j] in x for x in forms):
+                stem = forms[0][i:i + j]
+    return stem
+
+
+def collect_forms(words: List[str]) -> List[List[str]]:
+    forms = []
+    for word in words:
+        handler = LexemeHandler(word)
+        forms.append(handler._cases or handler._plural_cases)
+    return forms
+
+
+def measure(function, forms: List[List[str]], repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for word_forms in forms:
+            function(word_forms)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение поиска основы слова")
+    parser.add_argument("documents", nargs="*", default=["test_short.pdf", "test.pdf", "test_long.pdf"])
+    parser.add_argument("--words", help="файл со списком слов, по одному в строке")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.words:
+        with open(args.words, encoding="utf-8") as words_file:
+            words = sorted({line.strip() for line in words_file if line.strip()})
+    else:
+        words = sorted({word for document in args.documents for word in DocumentHandler(document).get_lexems()})
+    forms = [word_forms for word_forms in collect_forms(words) if word_forms]
+
+    mismatches = [word_forms for word_forms in forms if naive_common_stem(word_forms) != find_common_stem(word_forms)]
+    naive_time = measure(naive_common_stem, forms, args.repeat)
+    fast_time = measure(find_common_stem, forms, args.repeat)
+    print(f"слов: {len(forms)}, повторов: {args.repeat}")
+    print(f"перебор подстрок: {naive_time:.4f} с")
+    print(f"двоичный поиск по длине: {fast_time:.4f} с")
+    print(f"ускорение: {naive_time / fast_time:.2f}x, расхождений: {len(mismatches)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import argparse
+import glob
+import json
+import os
+import sys
+from typing import Dict, Iterable, List
+
+from model.dictionary_exporter.dictionary_exporter import export_formats, structure_to_record, write_csv, \
+    write_jsonl
+from model.dictionary_handler.dictionary_handler import DictionaryHandler, FUZZY_MAX_DISTANCE, TOP_LEXEMES_COUNT, \
+    search_kinds
+from model.instrumentation.instrumentation import get_instrumentation
+
+
+def expand_documents(patterns: List[str]) -> List[str]:
+    documents = []
+    for pattern in patterns:
+        if any(symbol in pattern for symbol in "*?["):
+            documents.extend(sorted(glob.glob(pattern, recursive=True)))
+        else:
+            documents.append(pattern)
+    return documents
+
+
+def build_dictionary(args) -> DictionaryHandler:
+    documents = expand_documents(args.documents)
+    if not documents:
+        raise SystemExit("Не найдено ни одного документа")
+    return DictionaryHandler(documents[0], use_cache=not args.no_cache, workers=args.workers, corpus=documents[1:])
+
+
+def to_record(structure: Dict, **extra) -> Dict:
+    record = dict(extra)
+    record.update(structure_to_record(structure))
+    return record
+
+
+def write_records(records: Iterable[Dict], stream):
+    for record in records:
+        stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def run_build(args):
+    handler = build_dictionary(args)
+    write_jsonl(handler.get_dictionary(), sys.stdout)
+
+
+def run_search(args):
+    handler = build_dictionary(args)
+    queries = args.queries or (line.strip() for line in sys.stdin)
+    for query in queries:
+        if not query:
+            continue
+        kind, structures = handler.search(query, args.by, args.distance)
+        if not structures:
+            write_records([{"Запрос": query, "Найдено": False}], sys.stdout)
+        write_records((to_record(structure, Запрос=query, Поиск=kind) for structure in structures), sys.stdout)
+        sys.stdout.flush()
+
+
+def run_top(args):
+    handler = build_dictionary(args)
+    document_ids = handler.get_document_ids()
+    document_id = None
+    if args.document:
+        path = os.path.abspath(args.document)
+        document_id = next((number for number, document in document_ids.items() if document == path), None)
+        if document_id is None:
+            raise SystemExit("Документ \"" + args.document + "\" не входит в корпус")
+    records = []
+    for structure, frequency in handler.get_top_lexemes(args.count, document_id):
+        documents = handler.get_lexeme_documents(next(iter(structure)))
+        records.append(to_record(structure, Частота=frequency,
+                                 Документы={document_ids[number]: count for number, count in documents.items()}))
+    write_records(records, sys.stdout)
+
+
+def run_export(args):
+    handler = build_dictionary(args)
+    if args.output == "-":
+        writer = write_csv if args.format == "csv" else write_jsonl
+        writer(handler.get_dictionary(), sys.stdout)
+        return
+    handler.export(args.output, args.format)
+
+
+def create_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Словарь естественного языка без графического интерфейса")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("documents", nargs="+", help="PDF-документы или шаблоны вида texts/*.pdf; "
+                                                     "разбираются вместе как корпус")
+    common.add_argument("--workers", type=int, default=1, help="число процессов для разбора")
+    common.add_argument("--no-cache", action="store_true", help="не использовать кэш словарей на диске")
+    common.add_argument("--stats", help="сохранить счётчики и время этапов в JSON-файл, \"-\" - stderr")
+    common.add_argument("--profile", action="store_true", help="добавить к статистике профиль cProfile")
+    common.add_argument("--profile-out", help="сохранить полный профиль cProfile в файл для pstats или snakeviz")
+
+    build = subparsers.add_parser("build", parents=[common], help="построить словарь и вывести его в JSONL")
+    build.set_defaults(function=run_build)
+
+    search = subparsers.add_parser("search", parents=[common], help="поиск лексем, результаты в JSONL")
+    search.add_argument("-q", "--query", dest="queries", action="append",
+                        help="запрос; без этого параметра запросы читаются из stdin по одному в строке")
+    search.add_argument("--by", choices=search_kinds, help="тип поиска; по умолчанию как в окне программы")
+    search.add_argument("--distance", type=int, default=FUZZY_MAX_DISTANCE,
+                        help="наибольшее число опечаток при поиске похожих слов")
+    search.set_defaults(function=run_search)
+
+    top = subparsers.add_parser("top", parents=[common], help="самые частые лексемы корпуса в JSONL")
+    top.add_argument("-n", "--count", type=int, default=TOP_LEXEMES_COUNT)
+    top.add_argument("--document", help="считать частоты только в этом документе корпуса")
+    top.set_defaults(function=run_top)
+
+    export = subparsers.add_parser("export", parents=[common], help="сохранить словарь в файл")
+    export.add_argument("-f", "--format", choices=export_formats,
+                        help="по умолчанию определяется по расширению файла, для stdout - jsonl")
+    export.add_argument("-o", "--output", default="-", help="путь к файлу, \"-\" - stdout")
+    export.set_defaults(function=run_export)
+    return parser
+
+
+def main(argv=None):
+    args = create_parser().parse_args(argv)
+    if args.command == "export" and args.output == "-" and args.format in ("pdf", "sqlite"):
+        raise SystemExit("Для форматов pdf и sqlite укажите --output")
+    if args.command == "export" and args.output != "-" and args.format is None \
+            and os.path.splitext(args.output)[1].lstrip(".").lower() not in export_formats:
+        raise SystemExit("Не удалось определить формат по расширению \"" + args.output + "\", укажите --format")
+    instrumentation = get_instrumentation()
+    if args.stats or args.profile or args.profile_out:
+        instrumentation.enable(profile=args.profile or bool(args.profile_out))
+    with instrumentation.profile():
+        args.function(args)
+    if args.profile_out:
+        instrumentation.save_profile(args.profile_out)
+    if args.stats and args.stats != "-":
+        instrumentation.save_report(args.stats)
+    elif args.stats or args.profile:
+        json.dump(instrumentation.get_report(), sys.stderr, ensure_ascii=False, indent=1)
+        sys.stderr.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import heapq
+from array import array
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+class CorpusStatistics:
+    # частоты лексем по документам: для каждого документа упорядоченные номера записей словаря
+    # и число их употреблений в двух array, общая частота каждой записи - в отдельном array
+    def __init__(self):
+        self._totals = array("I")  # номер записи -> число употреблений во всех документах
+        self._documents = {}  # номер документа -> (номера записей, частоты)
+
+    def add_document(self, document_id: int, frequencies: Dict[int, int]):
+        positions = array("I", sorted(frequencies))
+        counts = array("I", (frequencies[position] for position in positions))
+        self._documents[document_id] = (positions, counts)
+        if positions and positions[-1] >= len(self._totals):
+            self._totals.extend([0] * (positions[-1] + 1 - len(self._totals)))
+        for position, count in zip(positions, counts):
+            self._totals[position] += count
+
+    def remove_document(self, document_id: int) -> List[int]:
+        # возвращает номера записей, которые больше не встречаются ни в одном документе
+        positions, counts = self._documents.pop(document_id)
+        unused = []
+        for position, count in zip(positions, counts):
+            self._totals[position] -= count
+            if not self._totals[position]:
+                unused.append(position)
+        return unused
+
+    def renumber(self, positions: Sequence[int]):
+        # записи словаря пересобраны: новая запись номер N - это прежняя запись positions[N]
+        new_positions = {position: number for number, position in enumerate(positions)}
+        self._totals = array("I", (self.get_frequency(position) for position in positions))
+        for document_id, (document_positions, counts) in self._documents.items():
+            kept = [(new_positions[position], count) for position, count in zip(document_positions, counts)
+                    if position in new_positions]
+            self._documents[document_id] = (array("I", (position for position, _ in kept)),
+                                            array("I", (count for _, count in kept)))
+
+    def get_frequency(self, position: int, document_id: Optional[int] = None) -> int:
+        if document_id is None:
+            return self._totals[position] if position < len(self._totals) else 0
+        positions, counts = self._documents.get(document_id, ((), ()))
+        number = bisect_left(positions, position)
+        return counts[number] if number < len(positions) and positions[number] == position else 0
+
+    def get_documents(self, position: int) -> Dict[int, int]:
+        documents = {}
+        for document_id in self._documents:
+            count = self.get_frequency(position, document_id)
+            if count:
+                documents[document_id] = count
+        return documents
+
+    def get_document_frequencies(self, document_id: int) -> List[Tuple[int, int]]:
+        positions, counts = self._documents[document_id]
+        return list(zip(positions, counts))
+
+    def get_top(self, count: int, document_id: Optional[int] = None) -> List[Tuple[int, int]]:
+        # при равной частоте раньше идут записи, добавленные в словарь раньше
+        if document_id is None:
+            top = heapq.nlargest(count, range(len(self._totals)), key=self._totals.__getitem__)
+            return [(position, self._totals[position]) for position in top if self._totals[position]]
+        positions, counts = self._documents[document_id]
+        top = heapq.nlargest(count, range(len(positions)), key=counts.__getitem__)
+        return [(positions[number], counts[number]) for number in top]
+
+    def __contains__(self, document_id: int) -> bool:
+        return document_id in self._documents
+
+    def __len__(self) -> int:
+        return len(self._documents)
@@ -0,0 +1,92 @@
+import json
+import os
+import sqlite3
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from ..document_handler.document_handler import DocumentHandler
+from ..morphology_handler.morphology_handler import get_morphology_handler
+
+CACHE_FORMAT_VERSION = 3
+DEFAULT_CACHE_DIR = os.environ.get("EAZIIS_CACHE_DIR",
+                                   os.path.join(os.path.expanduser("~"), ".cache", "eaziis_dictionary"))
+
+
+class DictionaryCache:
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR):
+        os.makedirs(cache_dir, exist_ok=True)
+        self._path = os.path.join(cache_dir, "dictionary_cache.sqlite3")
+        self._connection = sqlite3.connect(self._path, check_same_thread=False)
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                key TEXT PRIMARY KEY,
+                lexemes BLOB NOT NULL,
+                structures BLOB NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS edits (
+                key TEXT NOT NULL,
+                lexeme TEXT NOT NULL,
+                prop TEXT NOT NULL,
+                value TEXT NOT NULL,
+                PRIMARY KEY (key, lexeme, prop)
+            );
+        """)
+        self._connection.commit()
+
+    def get_path(self) -> str:
+        return self._path
+
+    @staticmethod
+    def get_key(document: DocumentHandler) -> str:
+        return "{}:{}:{}".format(document.get_content_hash(), get_morphology_handler().get_version(),
+                                 CACHE_FORMAT_VERSION)
+
+    def load(self, key: str) -> Optional[Tuple[Dict[str, int], List[Dict], List[List[str]]]]:
+        row = self._connection.execute("SELECT lexemes, structures FROM documents WHERE key = ?",
+                                       (key,)).fetchone()
+        if row is None:
+            return None
+        analysis = _unpack(row[1])
+        return _unpack(row[0]), analysis["structures"], analysis["paradigms"]
+
+    def save(self, key: str, frequencies: Dict[str, int], structures: List[Dict], paradigms: List[List[str]]):
+        # лексемы хранятся вместе с числом их употреблений в документе
+        self._connection.execute("INSERT OR REPLACE INTO documents (key, lexemes, structures) VALUES (?, ?, ?)",
+                                 (key, _pack(frequencies),
+                                  _pack({"structures": structures, "paradigms": paradigms})))
+        self._connection.commit()
+
+    def load_edits(self, key: str) -> List[Tuple[str, str, str]]:
+        return self._connection.execute("SELECT lexeme, prop, value FROM edits WHERE key = ? ORDER BY rowid",
+                                        (key,)).fetchall()
+
+    def save_edit(self, key: str, lexeme: str, prop: str, value):
+        self._connection.execute("INSERT OR REPLACE INTO edits (key, lexeme, prop, value) VALUES (?, ?, ?, ?)",
+                                 (key, lexeme, prop, value))
+        self._connection.commit()
+
+    def clear(self):
+        self._connection.execute("DELETE FROM documents")
+        self._connection.execute("DELETE FROM edits")
+        self._connection.commit()
+
+    def close(self):
+        self._connection.close()
+
+
+def _pack(value) -> bytes:
+    return zlib.compress(json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def _unpack(data: bytes):
+    return json.loads(zlib.decompress(data).decode("utf-8"))
+
+
+_dictionary_cache = None
+
+
+def get_dictionary_cache() -> DictionaryCache:
+    global _dictionary_cache
+    if _dictionary_cache is None:
+        _dictionary_cache = DictionaryCache()
+    return _dictionary_cache
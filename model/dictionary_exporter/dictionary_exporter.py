@@ -0,0 +1,142 @@
+import csv
+import json
+import os
+import sqlite3
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from ..dictionary_store.dictionary_store import POS_PROPERTY, NORMAL_FORM_PROPERTY, STEM_PROPERTY, CASE_PROPERTY, \
+    format_structure
+
+LEXEME_FIELD = "Лексема"
+OTHER_FIELD = "Прочее"
+csv_fields = [LEXEME_FIELD, POS_PROPERTY, NORMAL_FORM_PROPERTY, STEM_PROPERTY, CASE_PROPERTY, OTHER_FIELD]
+export_formats = ["pdf", "csv", "jsonl", "sqlite"]
+
+FONT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "arial.ttf")
+_chunk_size = 1000  # записей в одной порции записи
+
+
+def structure_to_record(structure: Dict) -> Dict:
+    lexeme, struct = next(iter(structure.items()))
+    record = {LEXEME_FIELD: lexeme}
+    record.update(struct)
+    return record
+
+
+def _iter_chunks(entries: Iterable[Dict], chunk_size: int) -> Iterator[List[Dict]]:
+    iterator = iter(entries)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def write_jsonl(entries: Iterable[Dict], stream, chunk_size: int = _chunk_size):
+    for chunk in _iter_chunks(entries, chunk_size):
+        stream.writelines(json.dumps(structure_to_record(structure), ensure_ascii=False) + "\n"
+                          for structure in chunk)
+
+
+def write_csv(entries: Iterable[Dict], stream, chunk_size: int = _chunk_size):
+    writer = csv.writer(stream)
+    writer.writerow(csv_fields)
+    for chunk in _iter_chunks(entries, chunk_size):
+        writer.writerows(_get_row(structure) for structure in chunk)
+
+
+def write_sqlite(entries: Iterable[Dict], path: str, chunk_size: int = _chunk_size):
+    if os.path.exists(path):
+        os.remove(path)
+    connection = sqlite3.connect(path)
+    try:
+        connection.execute("CREATE TABLE lexemes (number INTEGER PRIMARY KEY, lexeme TEXT, part_of_speech TEXT, "
+                           "normal_form TEXT, stem TEXT, grammatical_case TEXT, other TEXT)")
+        number = 0
+        for chunk in _iter_chunks(entries, chunk_size):
+            rows = []
+            for structure in chunk:
+                number += 1
+                rows.append([number] + _get_row(structure))
+            connection.executemany("INSERT INTO lexemes VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        connection.execute("CREATE INDEX lexemes_lexeme ON lexemes (lexeme)")
+        connection.commit()
+    finally:
+        connection.close()
+
+
+class _PdfBuffer:
+    # fpdf дописывает документ в строку через +=, что квадратично по размеру файла
+    def __init__(self):
+        self._parts = []
+        self._length = 0
+
+    def __iadd__(self, text: str):
+        self._parts.append(text)
+        self._length += len(text)
+        return self
+
+    def __len__(self) -> int:
+        return self._length
+
+    def encode(self, encoding: str) -> bytes:
+        return "".join(self._parts).encode(encoding)
+
+
+def write_pdf(entries: Iterable[Dict], path: str, font_path: str = FONT_PATH, font_size: int = 8):
+    from fpdf import FPDF
+
+    class DictionaryPdf(FPDF):
+        def __init__(self):
+            super().__init__()
+            self.buffer = _PdfBuffer()
+
+        def footer(self):
+            self.set_y(-15)
+            self.cell(0, 10, str(self.page_no()) + " / {nb}", align="C")
+
+    pdf = DictionaryPdf()
+    pdf.alias_nb_pages()
+    pdf.set_auto_page_break(True, margin=20)
+    # метрики шрифта читаются из arial.pkl рядом с файлом шрифта, TTF не разбирается заново;
+    # в arial.pkl записан относительный путь к TTF, поэтому он заменяется абсолютным
+    pdf.add_font("Arial", "", font_path, uni=True)
+    pdf.set_font("Arial", size=font_size)
+    pdf.current_font["ttffile"] = font_path
+    pdf.add_page()
+    number = 0
+    for chunk in _iter_chunks(entries, _chunk_size):
+        for structure in chunk:
+            number += 1
+            pdf.cell(0, 5, " " + str(number) + ". " + format_structure(structure), ln=1)
+        _compact_font_subset(pdf)
+    pdf.output(path)
+
+
+def _compact_font_subset(pdf):
+    # fpdf добавляет в subset каждый выведенный символ, а при сохранении ищет в этом списке линейно
+    for font in pdf.fonts.values():
+        if "subset" in font:
+            font["subset"] = sorted(set(font["subset"]))
+
+
+def export_dictionary(entries: Iterable[Dict], path: str, export_format: Optional[str] = None):
+    export_format = export_format or os.path.splitext(path)[1].lstrip(".").lower()
+    if export_format == "pdf":
+        write_pdf(entries, path)
+    elif export_format == "sqlite":
+        write_sqlite(entries, path)
+    elif export_format in ("csv", "jsonl"):
+        writer = write_csv if export_format == "csv" else write_jsonl
+        with open(path, "w", encoding="utf-8", newline="") as output:
+            writer(entries, output)
+    else:
+        raise ValueError("Неизвестный формат экспорта: " + str(export_format))
+
+
+def _get_row(structure: Dict) -> List:
+    lexeme, struct = next(iter(structure.items()))
+    other = ", ".join(f"{prop}: {value}" for prop, value in struct.items() if prop not in csv_fields)
+    return [lexeme, struct.get(POS_PROPERTY), struct.get(NORMAL_FORM_PROPERTY), struct.get(STEM_PROPERTY),
+            struct.get(CASE_PROPERTY), other]
@@ -1,72 +1,348 @@
-from typing import List, Dict
+import os
 
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Dict, Optional, Sequence, Set, Tuple, Union
+
+from ..corpus_statistics.corpus_statistics import CorpusStatistics
+from ..dictionary_cache.dictionary_cache import DictionaryCache, get_dictionary_cache
+from ..dictionary_exporter.dictionary_exporter import LEXEME_FIELD, export_dictionary
+from ..dictionary_store.dictionary_store import DictionaryStore, format_structure, POS_PROPERTY, \
+    NORMAL_FORM_PROPERTY, STEM_PROPERTY, CASE_PROPERTY
 from ..document_handler.document_handler import DocumentHandler
-from ..lexeme_handler.lexeme_handler import LexemeHandler
+from ..instrumentation.instrumentation import get_instrumentation
+from ..lexeme_handler.lexeme_handler import LexemeHandler, analyze_lexeme_paradigms, cases_representation, \
+    initialize_analysis_worker, numbers_representation, pos_representation
+
+SEARCH_BY_LEXEME = "lexeme"
+SEARCH_BY_POS = "pos"
+SEARCH_BY_CASE = "case"
+SEARCH_BY_NORMAL_FORM = "normal_form"
+SEARCH_BY_WORDFORM = "wordform"
+SEARCH_BY_STEM = "stem"
+SEARCH_BY_PREFIX = "prefix"
+SEARCH_FUZZY = "fuzzy"
+search_kinds = [SEARCH_BY_LEXEME, SEARCH_BY_POS, SEARCH_BY_CASE, SEARCH_BY_NORMAL_FORM, SEARCH_BY_WORDFORM,
+                SEARCH_BY_STEM, SEARCH_BY_PREFIX, SEARCH_FUZZY]
+PREFIX_WILDCARD = "*"  # "дом*" - поиск по началу слова
+FUZZY_MAX_DISTANCE = 1
+NUMBER_PROPERTY = "Число"
+PROGRESS_DOCUMENTS = "documents"
+TOP_LEXEMES_COUNT = 10
 
 
 class DictionaryHandler:
-    def __init__(self, document_path: str):
-        self._document_handler = DocumentHandler(document_path)
-        self._dictionary = []
-        self._create_dictionary()
+    def __init__(self, document_path: str, use_cache: bool = True, cache: Optional[DictionaryCache] = None,
+                 workers: int = 1, progress: Optional[Callable[[str, int, int], None]] = None,
+                 corpus: Sequence[str] = ()):
+        # corpus - документы, которые разбираются вместе с исходным, по документу на процесс
+        self._workers = workers
+        self._progress = progress  # progress(этап, выполнено, всего)
+        self._document_handler = DocumentHandler(document_path, workers, progress)
+        self._documents = {}  # номер документа -> исходный и добавленные документы
+        self._next_document_id = 0
+        self._statistics = CorpusStatistics()  # частоты лексем по документам
+        self._instrumentation = get_instrumentation()
+        self._dictionary = DictionaryStore()
+        self._kept = set()  # номера записей, добавленных вручную, и созданных словоформ
+        self._cache = (cache or get_dictionary_cache()) if use_cache else None
+        self._cache_key = self._cache.get_key(self._document_handler) if self._cache else None
+        self._create_dictionary([DocumentHandler(path, workers, progress) for path in corpus])
 
     def get_document(self):
         return self._document_handler
+
+    def get_documents(self) -> List[DocumentHandler]:
+        return list(self._documents.values())
+
+    def get_document_ids(self) -> Dict[int, str]:
+        return {document_id: document.get_file_path() for document_id, document in self._documents.items()}
+
     def _get_lexems(self) -> List[str]:
         return self._document_handler.get_lexems()
 
-    def _create_dictionary(self):
-        for lexeme in self._get_lexems():
-            self._dictionary.append(LexemeHandler(lexeme).get_lexeme_struct())
+    def _analyze_documents(self, documents: List[DocumentHandler], keys: Optional[List[Optional[str]]] = None) \
+            -> List[Tuple[Dict[str, int], List[Dict], List[List[str]]]]:
+        # документы, которых нет в кэше, при нескольких процессах разбираются одновременно
+        keys = keys or [None] * len(documents)
+        if self._cache is not None:
+            keys = [key or self._cache.get_key(document) for document, key in zip(documents, keys)]
+        results = [self._load_cached(key) if key else None for key in keys]
+        pending = [number for number, result in enumerate(results) if result is None]
+        if not pending:
+            return results
+        known = self._get_known_lexemes()
+        workers = min(self._workers, os.cpu_count() or 1, len(pending))
+        if workers > 1:
+            analyzed = self._analyze_concurrently([documents[number] for number in pending], workers, known)
+        else:
+            analyzed = (self._analyze_frequencies(documents[number].get_lexeme_frequencies(), known)
+                        for number in pending)
+        for number, result in zip(pending, analyzed):
+            if keys[number]:
+                result = self._complete_analysis(*result)
+                with self._instrumentation.timer("dictionary.cache_save"):
+                    self._cache.save(keys[number], *result)
+            results[number] = result
+        return results
+
+    def _get_known_lexemes(self) -> Set[str]:
+        # разбор лексем словаря берётся из хранилища; изменённые, добавленные вручную и созданные словоформы
+        # разбираются заново, чтобы они не попали в кэш другого документа
+        known = self._dictionary.get_lexemes()
+        for position in self._kept:
+            lexeme = next(iter(self._dictionary.get_structure(position)))
+            if self._dictionary.get_position(lexeme) == position:
+                known.discard(lexeme)
+        if self._cache is not None and self._cache_key is not None and known:
+            known.difference_update(lexeme for lexeme, _, _ in self._cache.load_edits(self._cache_key))
+        return known
+
+    def _complete_analysis(self, frequencies: Dict[str, int], structures: List[Dict], paradigms: List[List[str]]) \
+            -> Tuple[Dict[str, int], List[Dict], List[List[str]]]:
+        # в кэш документа записываются все его лексемы, в том числе взятые из словаря
+        if len(structures) == len(frequencies):
+            return frequencies, structures, paradigms
+        analyzed = {next(iter(structure)): (structure, paradigm) for structure, paradigm in zip(structures, paradigms)}
+        structures, paradigms = [], []
+        for lexeme in frequencies:
+            structure, paradigm = analyzed.get(lexeme) or ({lexeme: self._dictionary.get(lexeme)},
+                                                           self._dictionary.get_paradigm(lexeme))
+            structures.append(structure)
+            paradigms.append(paradigm)
+        return frequencies, structures, paradigms
+
+    def _load_cached(self, key: str) -> Optional[Tuple[Dict[str, int], List[Dict], List[List[str]]]]:
+        with self._instrumentation.timer("dictionary.cache_load"):
+            cached = self._cache.load(key)
+        self._instrumentation.count("dictionary.cache_hits" if cached is not None else "dictionary.cache_misses")
+        return cached
+
+    def _analyze_frequencies(self, frequencies: Dict[str, int], known: Set[str]) \
+            -> Tuple[Dict[str, int], List[Dict], List[List[str]]]:
+        # лексемы, которые уже есть в словаре, повторно не разбираются
+        lexemes = [lexeme for lexeme in frequencies if lexeme not in known]
+        with self._instrumentation.timer("dictionary.analyze"):
+            structures, paradigms = analyze_lexeme_paradigms(lexemes, self._workers, progress=self._progress)
+        return frequencies, structures, paradigms
+
+    def _analyze_concurrently(self, documents: List[DocumentHandler], workers: int, known: Set[str]) \
+            -> List[Tuple[Dict[str, int], List[Dict], List[List[str]]]]:
+        results = []
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=initialize_analysis_worker,
+                                       initargs=(self._instrumentation.enabled,))
+        try:
+            with self._instrumentation.timer("dictionary.analyze"):
+                for frequencies, structures, paradigms, instrumentation in executor.map(
+                        _analyze_document_file, [document.get_file_path() for document in documents],
+                        [known] * len(documents)):
+                    results.append((frequencies, structures, paradigms))
+                    self._instrumentation.merge(instrumentation)
+                    if self._progress:
+                        self._progress(PROGRESS_DOCUMENTS, len(results), len(documents))
+        finally:
+            executor.shutdown(cancel_futures=True)
+        return results
+
+    def _add_document(self, document_handler: DocumentHandler, frequencies: Dict[str, int],
+                      structures: List[Dict], paradigms: List[List[str]]) -> int:
+        document_id = self._next_document_id
+        self._next_document_id += 1
+        self._documents[document_id] = document_handler
+        added = [number for number, structure in enumerate(structures) if next(iter(structure)) not in self._dictionary]
+        self._dictionary.extend([structures[number] for number in added], [paradigms[number] for number in added])
+        positions = {}
+        for lexeme, count in frequencies.items():
+            position = self._dictionary.get_position(lexeme)
+            if position is not None:
+                positions[position] = count
+        self._statistics.add_document(document_id, positions)
+        return document_id
+
+    def _apply_edits(self):
+        if self._cache is None or self._cache_key is None:
+            return
+        for lexeme, prop, value in self._cache.load_edits(self._cache_key):
+            self._dictionary.edit(lexeme, prop, value)
+
+    def _create_dictionary(self, corpus: List[DocumentHandler]):
+        documents = [self._document_handler] + corpus
+        results = self._analyze_documents(documents, [self._cache_key] + [None] * len(corpus))
+        with self._instrumentation.timer("dictionary.build"):
+            for document_handler, result in zip(documents, results):
+                self._add_document(document_handler, *result)
+            self._apply_edits()
 
     def get_lexeme_structure(self, lexeme: str) -> Dict:
-        for structure in self._dictionary:
-            lex, struct = list(structure.items())[0]
-            if lex == lexeme:
-                return struct
-        return {}
+        return self._dictionary.get(lexeme)
+
+    def get_lexeme_position(self, lexeme: str) -> Optional[int]:
+        # номер строки в get_dictionary()
+        return self._dictionary.get_row(lexeme)
 
     def edit_lexeme_structure(self, lexeme: str, prop: str, value):
-        structure = self.get_lexeme_structure(lexeme)
-        structure[prop] = value
+        self._dictionary.edit(lexeme, prop, value)
+        if self._cache is not None and self._cache_key is not None and lexeme in self._dictionary:
+            self._cache.save_edit(self._cache_key, lexeme, prop, value)
 
     def add_lexeme_structure(self, lexeme: str):
-        self._dictionary.append(LexemeHandler(lexeme).get_lexeme_struct())
+        handler = LexemeHandler(lexeme)
+        self._keep(self._dictionary.add(handler.get_lexeme_struct(), handler.get_paradigm()))
 
     def generate_wordform(self, lexeme: str, case_ru: str, singular: bool):
-        self._dictionary.append(LexemeHandler(lexeme).generate_wordform(case_ru, singular))
+        wordform = self.prepare_wordform(lexeme, case_ru, singular)
+        if wordform is not None:
+            self.add_wordform(*wordform)
+
+    def prepare_wordform(self, lexeme: str, case_ru: str, singular: bool) \
+            -> Optional[Tuple[Dict, Optional[List[str]], Optional[str]]]:
+        # только разбор, словарь не меняется: можно вызывать из фонового потока
+        if case_ru not in cases_representation.values():
+            return None
+        paradigm = self._dictionary.get_paradigm(lexeme)
+        slot = list(cases_representation.values()).index(case_ru) + (0 if singular else len(cases_representation))
+        if paradigm and paradigm[slot]:
+            struct = self._dictionary.get(lexeme)
+            return {paradigm[slot]: {POS_PROPERTY: struct.get(POS_PROPERTY),
+                                     NORMAL_FORM_PROPERTY: struct.get(NORMAL_FORM_PROPERTY),
+                                     STEM_PROPERTY: struct.get(STEM_PROPERTY),
+                                     CASE_PROPERTY: case_ru}}, None, lexeme
+        handler = LexemeHandler(lexeme)
+        paradigm = handler.get_paradigm()
+        return handler.generate_wordform(case_ru, singular), paradigm, None
+
+    def add_wordform(self, structure: Dict, paradigm: Optional[List[str]] = None, paradigm_of: Optional[str] = None):
+        self._keep(self._dictionary.add(structure, paradigm, paradigm_of))
+
+    def _keep(self, position: Optional[int]):
+        if position is not None:
+            self._kept.add(position)
+
+    def get_lexeme_paradigm(self, lexeme: str) -> List[str]:
+        return self._dictionary.get_paradigm(lexeme)
+
+    def find_lexemes_by_wordform(self, wordform: str) -> List[Dict]:
+        lexemes = []
+        for structure, slot in self._dictionary.find_wordform(wordform):
+            number, case = divmod(slot, len(cases_representation))
+            lexemes.append({LEXEME_FIELD: next(iter(structure)),
+                            NUMBER_PROPERTY: list(numbers_representation.values())[number],
+                            CASE_PROPERTY: list(cases_representation.values())[case]})
+        return lexemes
+
+    def append_document(self, document_path) -> int:
+        return self.add_documents([document_path])[0]
 
-    def append_document(self, document_path):
-        document_handler = DocumentHandler(document_path)
-        for lexeme in document_handler.get_lexems():
-            if lexeme not in self._get_lexems():
-                self._dictionary.append(LexemeHandler(lexeme).get_lexeme_struct())
+    def add_documents(self, documents: Sequence[Union[str, DocumentHandler]]) -> List[int]:
+        return self.apply_documents(self.analyze_documents(documents))
+
+    def analyze_documents(self, documents: Sequence[Union[str, DocumentHandler]]) \
+            -> List[Tuple[DocumentHandler, Dict[str, int], List[Dict], List[List[str]]]]:
+        # только чтение и разбор документов, словарь не меняется: можно вызывать из фонового потока
+        documents = [document if isinstance(document, DocumentHandler)
+                     else DocumentHandler(document, self._workers, self._progress) for document in documents]
+        return [(document_handler, *result)
+                for document_handler, result in zip(documents, self._analyze_documents(documents))]
+
+    def apply_documents(self, analyzed: List[Tuple[DocumentHandler, Dict[str, int], List[Dict], List[List[str]]]]) \
+            -> List[int]:
+        with self._instrumentation.timer("dictionary.append"):
+            document_ids = [self._add_document(*document) for document in analyzed]
+            self._apply_edits()
+        return document_ids
+
+    def remove_document(self, document_id: int):
+        # частоты уменьшаются на вклад документа; лексемы, которых не осталось ни в одном документе,
+        # убираются из индексов словаря без повторного чтения PDF и разбора
+        if document_id not in self._documents:
+            raise ValueError("Нет документа с номером " + str(document_id))
+        document_handler = self._documents.pop(document_id)
+        with self._instrumentation.timer("dictionary.remove"):
+            # записи, добавленные вручную, и созданные словоформы остаются, даже если документ их содержал
+            self._dictionary.remove(position for position in self._statistics.remove_document(document_id)
+                                    if position not in self._kept)
+            # место удалённых записей освобождается, когда их становится больше, чем оставшихся
+            if self._dictionary.get_deleted_count() > len(self._dictionary):
+                positions = self._dictionary.compact()
+                self._statistics.renumber(positions)
+                self._kept = {number for number, position in enumerate(positions) if position in self._kept}
+        if document_handler is self._document_handler:
+            # правки сохраняются для нового исходного документа, а не для удалённого
+            self._document_handler = next(iter(self._documents.values()), document_handler)
+            self._cache_key = self._cache.get_key(self._document_handler) \
+                if self._cache is not None and self._documents else None
+
+    def get_lexeme_frequency(self, lexeme: str, document_id: Optional[int] = None) -> int:
+        position = self._dictionary.get_position(lexeme)
+        return self._statistics.get_frequency(position, document_id) if position is not None else 0
+
+    def get_lexeme_documents(self, lexeme: str) -> Dict[int, int]:
+        position = self._dictionary.get_position(lexeme)
+        return self._statistics.get_documents(position) if position is not None else {}
+
+    def get_top_lexemes(self, count: int = TOP_LEXEMES_COUNT, document_id: Optional[int] = None) \
+            -> List[Tuple[Dict, int]]:
+        return [(self._dictionary.get_structure(position), frequency)
+                for position, frequency in self._statistics.get_top(count, document_id)]
+
+    def get_document_lexemes(self, document_id: int) -> List[Tuple[Dict, int]]:
+        return [(self._dictionary.get_structure(position), frequency)
+                for position, frequency in self._statistics.get_document_frequencies(document_id)]
+
+    def search(self, query: str, kind: Optional[str] = None,
+               max_distance: int = FUZZY_MAX_DISTANCE) -> Tuple[str, List[Dict]]:
+        with self._instrumentation.timer("dictionary.search"):
+            found_kind, structures = self._search(query, kind, max_distance)
+        self._instrumentation.count("dictionary.search." + (found_kind or "not_found"))
+        return found_kind, structures
+
+    def _search(self, query: str, kind: Optional[str], max_distance: int) -> Tuple[str, List[Dict]]:
+        if kind == SEARCH_BY_PREFIX or (kind is None and query.endswith(PREFIX_WILDCARD)):
+            return SEARCH_BY_PREFIX, self._dictionary.find_prefix(query.rstrip(PREFIX_WILDCARD))
+        if kind in (None, SEARCH_BY_LEXEME) and query in self._dictionary:
+            return SEARCH_BY_LEXEME, [{query: self.get_lexeme_structure(query)}]
+        if kind == SEARCH_BY_POS or (kind is None and query in pos_representation.values()):
+            return SEARCH_BY_POS, self._dictionary.get_by_pos(query)
+        if kind == SEARCH_BY_CASE or (kind is None and query in cases_representation.values()):
+            return SEARCH_BY_CASE, self._dictionary.get_by_case(query)
+        if kind in (None, SEARCH_BY_NORMAL_FORM):
+            structures = self._dictionary.get_by_normal_form(query)
+            if structures:
+                return SEARCH_BY_NORMAL_FORM, structures
+        if kind in (None, SEARCH_BY_WORDFORM):
+            lexemes = dict.fromkeys(structure[LEXEME_FIELD] for structure in self.find_lexemes_by_wordform(query))
+            if lexemes:
+                return SEARCH_BY_WORDFORM, [{lexeme: self.get_lexeme_structure(lexeme)} for lexeme in lexemes]
+        if kind in (None, SEARCH_BY_STEM):
+            structures = self._dictionary.find_stem(query)
+            if structures:
+                return SEARCH_BY_STEM, structures
+        if kind in (None, SEARCH_FUZZY):
+            structures = [structure for structure, _ in self._dictionary.find_similar(query, max_distance)]
+            if structures:
+                return SEARCH_FUZZY, structures
+        return "", []
 
     def get_lexeme_structures_by_pos(self, part_of_speech: str) -> str:
         structures = ""
         number = 1
-        for struct in self._dictionary:
-            if list(struct.values())[0].get("Часть речи") == part_of_speech:
-                structures += str(number) + ". " + self.get_dictionary_string(struct) + "\n"
-                number += 1
+        for struct in self._dictionary.get_by_pos(part_of_speech):
+            structures += str(number) + ". " + self.get_dictionary_string(struct) + "\n"
+            number += 1
         return structures
 
     def get_lexeme_structures_by_case(self, case: str) -> str:
         structures = ""
         number = 1
-        for struct in self._dictionary:
-            if list(struct.values())[0].get("Падеж") == case:
-                structures += str(number) + ". " + self.get_dictionary_string(struct) + "\n"
-                number += 1
+        for struct in self._dictionary.get_by_case(case):
+            structures += str(number) + ". " + self.get_dictionary_string(struct) + "\n"
+            number += 1
         return structures
 
     def get_lexeme_structure_by_normal_form(self, normal_form: str) -> str:
-        structure = ""
-        for struct in self._dictionary:
-            if list(struct.values())[0].get("Начальная форма") == normal_form:
-                structure += remove_structure_symbols(str(self.get_lexeme_structure(list(struct.keys())[0])))
-                break
-        return structure
+        structures = self._dictionary.get_by_normal_form(normal_form)
+        if not structures:
+            return ""
+        return remove_structure_symbols(str(self.get_lexeme_structure(next(iter(structures[0])))))
 
     def get_dictionary_string(self, dictionary):
         string = ""
@@ -76,15 +352,22 @@ class DictionaryHandler:
 
     @staticmethod
     def get_full_dictionary_string(dictionary):
-        string = ""
-        number = 1
-        for struct in dictionary:
-            string += " " + str(number) + ". " + remove_structure_symbols(str(struct)) + "\n"
-            number += 1
-        return string
+        return "".join(" " + str(number) + ". " + format_structure(struct) + "\n"
+                       for number, struct in enumerate(dictionary, 1))
 
     def get_dictionary(self) -> List:
-        return self._dictionary
+        return self._dictionary.get_entries()
+
+    def export(self, path: str, export_format: Optional[str] = None):
+        with self._instrumentation.timer("dictionary.export"):
+            export_dictionary(self._dictionary, path, export_format)
+
+
+def _analyze_document_file(file_path: str, known: Set[str]) \
+        -> Tuple[Dict[str, int], List[Dict], List[List[str]], Dict]:
+    frequencies = DocumentHandler(file_path).get_lexeme_frequencies()
+    structures, paradigms = analyze_lexeme_paradigms([lexeme for lexeme in frequencies if lexeme not in known])
+    return frequencies, structures, paradigms, get_instrumentation().pop_data()
 
 
 def remove_structure_symbols(structure: str):
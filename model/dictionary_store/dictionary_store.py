@@ -0,0 +1,370 @@
+from array import array
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from ..search_index.search_index import SearchIndex
+
+POS_PROPERTY = "Часть речи"
+NORMAL_FORM_PROPERTY = "Начальная форма"
+STEM_PROPERTY = "Основа"
+CASE_PROPERTY = "Падеж"
+PARADIGM_SIZE = 12  # 6 падежей единственного и 6 падежей множественного числа
+SEARCH_LIMIT = 50
+_min_stem_length = 3  # более короткие начала слова не считаются основой при поиске
+
+_absent = object()  # у записи нет такого свойства
+_no_form = 0xFFFFFFFF  # в парадигме нет такой формы
+
+
+class StringTable:
+    def __init__(self):
+        self._strings = []
+        self._ids = {}
+
+    def add(self, string) -> int:
+        string_id = self._ids.get(string)
+        if string_id is None:
+            string_id = len(self._strings)
+            self._strings.append(string)
+            self._ids[string] = string_id
+        return string_id
+
+    def get_id(self, string) -> Optional[int]:
+        return self._ids.get(string)
+
+    def get(self, string_id: int):
+        return self._strings[string_id]
+
+    def __len__(self) -> int:
+        return len(self._strings)
+
+
+class DictionaryEntries(Sequence):
+    # записи словаря в прежнем формате {лексема: {...}}, собираются при обращении
+    def __init__(self, store: "DictionaryStore"):
+        self._store = store
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self._store.get_entry(number) for number in range(*row.indices(len(self)))]
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("dictionary entry index out of range")
+        return self._store.get_entry(row)
+
+    def __iter__(self) -> Iterator[Dict]:
+        for row in range(len(self)):
+            yield self._store.get_entry(row)
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (list, tuple, DictionaryEntries)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+
+class DictionaryStore:
+    # записи хранятся по столбцам: номера строк из общей таблицы в array вместо словаря на каждую лексему
+    _columns = [POS_PROPERTY, NORMAL_FORM_PROPERTY, STEM_PROPERTY, CASE_PROPERTY]
+    _indexed_properties = [POS_PROPERTY, CASE_PROPERTY, NORMAL_FORM_PROPERTY, STEM_PROPERTY]
+
+    def __init__(self):
+        self._strings = StringTable()  # значения свойств и словоформы
+        self._strings.add(_absent)
+        self._lexemes = []  # лексемы в порядке добавления
+        self._values = {prop: array("I") for prop in self._columns}  # свойство -> номер значения для каждой записи
+        self._other = {}  # номер записи -> прочие свойства, добавленные при изменении
+        self._by_lexeme = {}  # лексема -> номер первой записи
+        self._duplicates = {}  # лексема -> номера следующих записей с той же лексемой
+        self._deleted = set()  # номера удалённых записей, место освобождается при compact
+        self._live = None  # номер строки -> номер записи; None, пока удалённых записей нет
+        self._indexes = {prop: {} for prop in self._indexed_properties}  # свойство -> номер значения -> номера записей
+        self._paradigms = array("I")  # по PARADIGM_SIZE номеров словоформ на каждую различную парадигму
+        self._paradigm_offsets = array("I")  # номер записи -> начало её парадигмы в _paradigms
+        self._by_wordform = {}  # номер словоформы -> номер записи * PARADIGM_SIZE + номер формы
+        self._search_index = SearchIndex()  # лексемы для поиска по началу слова и с опечатками
+
+    def add(self, structure: Dict, paradigm: Optional[List[str]] = None, paradigm_of: Optional[str] = None) \
+            -> Optional[int]:
+        # возвращает номер добавленной записи
+        if not structure:
+            return None
+        position = len(self._lexemes)
+        self._search_index.add(self._add(structure, paradigm, paradigm_of))
+        return position
+
+    def _add(self, structure: Dict, paradigm: Optional[List[str]], paradigm_of: Optional[str] = None) -> str:
+        # запись без поискового индекса: extend и select пополняют его одним слиянием
+        lexeme, struct = next(iter(structure.items()))
+        position = len(self._lexemes)
+        value_ids = [self._strings.add(struct.get(prop, _absent)) for prop in self._columns]
+        for prop, value_id in zip(self._columns, value_ids):
+            self._values[prop].append(value_id)
+        other = {prop: value for prop, value in struct.items() if prop not in self._values}
+        if other:
+            self._other[position] = other
+        source = self._by_lexeme.get(paradigm_of) if paradigm_of is not None else None
+        if source is not None:
+            self._paradigm_offsets.append(self._paradigm_offsets[source])
+        else:
+            self._paradigm_offsets.append(self._add_paradigm(paradigm))
+        # лексема добавляется после всех столбцов, чтобы len() не учитывал недописанную запись
+        self._lexemes.append(lexeme)
+        if self._live is not None:
+            self._live.append(position)
+        for prop, value_id in zip(self._columns, value_ids):
+            if prop in self._indexes:
+                self._index(prop, value_id, position)
+        self._index_paradigm(position)
+        if lexeme in self._by_lexeme:
+            _add_position(self._duplicates, lexeme, position)
+        else:
+            self._by_lexeme[lexeme] = position
+        return lexeme
+
+    def extend(self, structures: List[Dict], paradigms: Optional[List[List[str]]] = None):
+        self._search_index.extend([self._add(structure, paradigms[number] if paradigms else None)
+                                   for number, structure in enumerate(structures) if structure])
+
+    def select(self, positions: Sequence[int]) -> "DictionaryStore":
+        # новое хранилище только с указанными записями, без повторного анализа лексем
+        store = DictionaryStore()
+        store.extend([self.get_structure(position) for position in positions],
+                     [self._get_paradigm_at(position) for position in positions])
+        return store
+
+    def remove(self, positions: Iterable[int]):
+        # записи только помечаются удалёнными и убираются из индексов, номера остальных записей не меняются
+        removed = {position for position in positions
+                   if position < len(self._lexemes) and position not in self._deleted}
+        if not removed:
+            return
+        self._deleted.update(removed)
+        live = self._live if self._live is not None else range(len(self._lexemes))
+        self._live = array("I", (position for position in live if position not in removed))
+        for prop in self._indexed_properties:
+            values = self._values[prop]
+            _remove_positions(self._indexes[prop], ((values[position], position) for position in removed))
+        _remove_positions(self._by_wordform, (slot for position in removed
+                                              for slot in self._iter_paradigm_slots(position)))
+        dropped = []  # лексемы, которых в словаре больше нет
+        for position in sorted(removed):
+            self._other.pop(position, None)
+            if self._remove_lexeme(self._lexemes[position], position):
+                dropped.append(self._lexemes[position])
+        self._search_index.discard(dropped)
+
+    def _remove_lexeme(self, lexeme: str, position: int) -> bool:
+        if self._by_lexeme.get(lexeme) != position:
+            _remove_position(self._duplicates, lexeme, position)
+            return False
+        duplicates = _get_positions(self._duplicates, lexeme)
+        if not duplicates:
+            del self._by_lexeme[lexeme]
+            return True
+        self._by_lexeme[lexeme] = duplicates[0]
+        _remove_position(self._duplicates, lexeme, duplicates[0])
+        return False
+
+    def get_deleted_count(self) -> int:
+        return len(self._deleted)
+
+    def compact(self) -> List[int]:
+        # хранилище пересобирается без удалённых записей; возвращает прежние номера оставшихся записей
+        positions = list(self._live if self._live is not None else range(len(self._lexemes)))
+        # содержимое заменяется на месте: таблица окна держит ссылку на это хранилище
+        self.__dict__.update(self.select(positions).__dict__)
+        return positions
+
+    def get_entry(self, row: int) -> Dict:
+        return self.get_structure(self._live[row] if self._live is not None else row)
+
+    def get_row(self, lexeme: str) -> Optional[int]:
+        # номер строки записи среди неудалённых, как в get_entries
+        position = self._by_lexeme.get(lexeme)
+        if position is None or self._live is None:
+            return position
+        return bisect_left(self._live, position)
+
+    def get_structure(self, position: int) -> Dict:
+        struct = {}
+        for prop in self._columns:
+            value = self._strings.get(self._values[prop][position])
+            if value is not _absent:
+                struct[prop] = value
+        struct.update(self._other.get(position, {}))
+        return {self._lexemes[position]: struct}
+
+    def get_paradigm(self, lexeme: str) -> List[str]:
+        position = self._by_lexeme.get(lexeme)
+        return self._get_paradigm_at(position) if position is not None else []
+
+    def _get_paradigm_at(self, position: int) -> List[str]:
+        if self._paradigm_offsets[position] == _no_form:
+            return []
+        offset = self._paradigm_offsets[position]
+        return [self._strings.get(wordform_id) if wordform_id != _no_form else ""
+                for wordform_id in self._paradigms[offset:offset + PARADIGM_SIZE]]
+
+    def find_wordform(self, wordform: str) -> List[Tuple[Dict, int]]:
+        wordform_id = self._strings.get_id(wordform)
+        if wordform_id is None:
+            return []
+        return [(self.get_structure(slot // PARADIGM_SIZE), slot % PARADIGM_SIZE)
+                for slot in _get_positions(self._by_wordform, wordform_id)]
+
+    def _add_paradigm(self, paradigm: Optional[List[str]]) -> int:
+        if not paradigm or not any(paradigm):
+            return _no_form
+        offset = len(self._paradigms)
+        self._paradigms.extend(self._strings.add(wordform) if wordform else _no_form for wordform in paradigm)
+        return offset
+
+    def _index_paradigm(self, position: int):
+        for wordform_id, slot in self._iter_paradigm_slots(position):
+            _add_position(self._by_wordform, wordform_id, slot)
+
+    def _iter_paradigm_slots(self, position: int) -> Iterator[Tuple[int, int]]:
+        offset = self._paradigm_offsets[position]
+        if offset == _no_form:
+            return
+        for number, wordform_id in enumerate(self._paradigms[offset:offset + PARADIGM_SIZE]):
+            if wordform_id != _no_form:
+                yield wordform_id, position * PARADIGM_SIZE + number
+
+    def get_position(self, lexeme: str) -> Optional[int]:
+        return self._by_lexeme.get(lexeme)
+
+    def get(self, lexeme: str) -> Dict:
+        position = self._by_lexeme.get(lexeme)
+        if position is None:
+            return {}
+        return self.get_structure(position)[lexeme]
+
+    def edit(self, lexeme: str, prop: str, value):
+        position = self._by_lexeme.get(lexeme)
+        if position is None:
+            return
+        if prop not in self._values:
+            self._other.setdefault(position, {})[prop] = value
+            return
+        value_id = self._strings.add(value)
+        if prop in self._indexes:
+            self._unindex(prop, self._values[prop][position], position)
+            self._index(prop, value_id, position)
+        self._values[prop][position] = value_id
+
+    def get_by_pos(self, part_of_speech: str) -> List[Dict]:
+        return self._get_by(POS_PROPERTY, part_of_speech)
+
+    def get_by_case(self, case: str) -> List[Dict]:
+        return self._get_by(CASE_PROPERTY, case)
+
+    def get_by_normal_form(self, normal_form: str) -> List[Dict]:
+        return self._get_by(NORMAL_FORM_PROPERTY, normal_form)
+
+    def get_by_stem(self, stem: str) -> List[Dict]:
+        return self._get_by(STEM_PROPERTY, stem)
+
+    def find_prefix(self, prefix: str, limit: int = SEARCH_LIMIT) -> List[Dict]:
+        return [self.get_structure(self._by_lexeme[lexeme])
+                for lexeme in self._search_index.find_prefix(prefix, limit)]
+
+    def find_stem(self, word: str, limit: int = SEARCH_LIMIT) -> List[Dict]:
+        # записи, основа которых совпадает с началом слова; сначала самые длинные основы
+        structures = []
+        for length in range(len(word), min(_min_stem_length, len(word)) - 1, -1):
+            structures.extend(self.get_by_stem(word[:length]))
+            if len(structures) >= limit:
+                break
+        return structures[:limit]
+
+    def find_similar(self, word: str, max_distance: int = 1, limit: int = SEARCH_LIMIT) -> List[Tuple[Dict, int]]:
+        return [(self.get_structure(self._by_lexeme[lexeme]), distance)
+                for lexeme, distance in self._search_index.find_similar(word, max_distance, limit)]
+
+    def get_entries(self) -> DictionaryEntries:
+        return DictionaryEntries(self)
+
+    def get_lexemes(self) -> Set[str]:
+        return set(self._by_lexeme)
+
+    def _get_by(self, prop: str, value) -> List[Dict]:
+        value_id = self._strings.get_id(value)
+        return [self.get_structure(position) for position in _get_positions(self._indexes[prop], value_id)]
+
+    def _index(self, prop: str, value_id: int, position: int):
+        _add_position(self._indexes[prop], value_id, position)
+
+    def _unindex(self, prop: str, value_id: int, position: int):
+        _remove_position(self._indexes[prop], value_id, position)
+
+    def __contains__(self, lexeme: str) -> bool:
+        return lexeme in self._by_lexeme
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(self.get_entries())
+
+    def __len__(self) -> int:
+        return len(self._lexemes) - len(self._deleted)
+
+
+# в индексах одиночный номер хранится как int, несколько номеров - как упорядоченный array
+def _add_position(index: Dict, key, position: int):
+    positions = index.get(key)
+    if positions is None:
+        index[key] = position
+    elif isinstance(positions, int):
+        index[key] = array("I", sorted((positions, position)))
+    elif positions[-1] < position:
+        positions.append(position)
+    else:
+        insort(positions, position)
+
+
+def _remove_position(index: Dict, key, position: int):
+    positions = index.get(key)
+    if positions is None:
+        return
+    if isinstance(positions, int):
+        if positions == position:
+            del index[key]
+        return
+    number = bisect_left(positions, position)
+    if number < len(positions) and positions[number] == position:
+        del positions[number]
+    if len(positions) == 1:
+        index[key] = positions[0]
+
+
+def _remove_positions(index: Dict, entries: Iterable[Tuple[object, int]]):
+    # удаление многих номеров сразу: array ключа пересобирается один раз, а не сдвигается на каждый номер
+    removed = {}  # ключ с несколькими номерами -> удаляемые номера
+    for key, position in entries:
+        positions = index.get(key)
+        if isinstance(positions, int):
+            if positions == position:
+                del index[key]
+        elif positions is not None:
+            removed.setdefault(key, set()).add(position)
+    for key, key_removed in removed.items():
+        kept = array("I", (position for position in index[key] if position not in key_removed))
+        if len(kept) > 1:
+            index[key] = kept
+        elif kept:
+            index[key] = kept[0]
+        else:
+            del index[key]
+
+
+def _get_positions(index: Dict, key) -> Sequence[int]:
+    positions = index.get(key, ())
+    return (positions,) if isinstance(positions, int) else positions
+
+
+def format_structure(structure: Dict) -> str:
+    lexeme, struct = next(iter(structure.items()))
+    return lexeme + ": " + ", ".join(f"{prop}: {value}" for prop, value in struct.items())
@@ -1,9 +1,11 @@
+import hashlib
 import os
 
-import pymorphy2
-
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from io import StringIO
-from typing import List
+from itertools import islice
+from typing import Callable, Dict, Iterator, List, Optional
 
 from pdfminer.converter import TextConverter
 from pdfminer.layout import LAParams
@@ -12,33 +14,60 @@ from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
 from pdfminer.pdfpage import PDFPage
 from pdfminer.pdfparser import PDFParser
 
+from ..instrumentation.instrumentation import get_instrumentation
+from ..morphology_handler.morphology_handler import get_morphology_handler
+
+PROGRESS_PAGES = "pages"
+
 
 class DocumentHandler:
-    _analyzer = pymorphy2.MorphAnalyzer()
+    _analyzer = get_morphology_handler()
+    _instrumentation = get_instrumentation()
     _ignored_lexems = ["можно", "всей"]
     _punctuation_marks = [",", "!", "?", "`", "\"", "\\", "|", "/", "\n", "%", "-"]
+    _punctuation_table = str.maketrans("", "", "".join(_punctuation_marks))
+    _sentence_table = str.maketrans(".", " ")
     _incorrect_pos = ["NPRO", "PREP", "NUMR", "CONJ", "PRCL", "INTJ", "PRED", "COMP", "ADVB"]
 
-    def __init__(self, doc_path: str):
+    _min_pages_per_worker = 4
+
+    def __init__(self, doc_path: str, workers: int = 1, progress: Optional[Callable[[str, int, int], None]] = None):
         self._file_name = doc_path
+        self._workers = workers
+        self._progress = progress  # progress(этап, выполнено, всего)
 
     @staticmethod
-    def convert_pdf_to_string(file_path: str) -> str:
-        output_string = StringIO()
-        with open(file_path, 'rb') as in_file:
-            parser = PDFParser(in_file)
-            doc = PDFDocument(parser)
-            manager = PDFResourceManager()
-            device = TextConverter(manager, output_string, laparams=LAParams())
-            interpreter = PDFPageInterpreter(manager, device)
-            for page in PDFPage.create_pages(doc):
-                interpreter.process_page(page)
-
-        return output_string.getvalue()[:-3]
+    def iter_pdf_text(file_path: str, workers: int = 1) -> Iterator[str]:
+        page_count = count_pdf_pages(file_path) if workers > 1 else 0
+        workers = min(workers, os.cpu_count() or 1, page_count // DocumentHandler._min_pages_per_worker)
+        if workers <= 1:
+            yield from iter_pdf_pages(file_path)
+            return
+
+        chunk_size = -(-page_count // workers)
+        starts = list(range(0, page_count, chunk_size))
+        executor = ProcessPoolExecutor(max_workers=len(starts))
+        try:
+            for pages in executor.map(list_pdf_pages, [file_path] * len(starts), starts,
+                                      [start + chunk_size for start in starts]):
+                yield from pages
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+    @staticmethod
+    def convert_pdf_to_string(file_path: str, workers: int = 1) -> str:
+        return "".join(DocumentHandler.iter_pdf_text(file_path, workers))[:-3]
 
     def get_file_path(self) -> str:
         return os.path.abspath(self._file_name)
 
+    def get_content_hash(self) -> str:
+        digest = hashlib.sha256()
+        with open(self.get_file_path(), 'rb') as in_file:
+            for chunk in iter(lambda: in_file.read(1 << 20), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
     def _is_correct_pos(self, lexeme: str) -> bool:
         result = self._analyzer.parse(lexeme)
         for pos in self._incorrect_pos:
@@ -47,20 +76,69 @@ class DocumentHandler:
         return True
 
     def _replace_punctuation(self, word: str) -> str:
-        for mark in self._punctuation_marks:
-            word = word.replace(mark, "")
-        return word
+        return word.translate(self._punctuation_table)
+
+    def _iter_text(self) -> Iterator[str]:
+        tail = ""  # последние три символа документа отбрасываются, как в convert_pdf_to_string
+        page_count = count_pdf_pages(self.get_file_path()) if self._progress else 0
+        pages = self._instrumentation.iterate(self.iter_pdf_text(self.get_file_path(), self._workers),
+                                              "document.extract")
+        for number, page in enumerate(pages, 1):
+            self._instrumentation.count("document.pages")
+            if self._progress:
+                self._progress(PROGRESS_PAGES, number, page_count)
+            text = tail + page
+            tail = text[-3:]
+            yield text[:-3]
+
+    def _iter_tokens(self) -> Iterator[str]:
+        carry = ""  # слово, разрезанное границей страницы
+        for text in self._iter_text():
+            text = (carry + text).translate(self._sentence_table)
+            tokens = text.split()
+            carry = tokens.pop() if tokens and not text[-1].isspace() else ""
+            self._instrumentation.count("document.tokens", len(tokens))
+            yield from tokens
+        if carry:
+            self._instrumentation.count("document.tokens")
+            yield carry
+
+    def get_lexeme_frequencies(self) -> Dict[str, int]:
+        # число употреблений каждой лексемы в документе, лексемы в порядке get_lexems
+        with self._instrumentation.timer("document.tokenize"):
+            tokens = Counter(self._iter_tokens())
+        frequencies = Counter()
+        with self._instrumentation.timer("document.filter"):
+            for wrd, count in tokens.items():
+                if (wrd not in self._ignored_lexems) and wrd.isalpha() and self._is_correct_pos(wrd):
+                    frequencies[self._replace_punctuation(wrd).lower()] += count
+        self._instrumentation.count("document.unique_tokens", len(tokens))
+        self._instrumentation.count("document.lexemes", len(frequencies))
+        return {lexeme: frequencies[lexeme] for lexeme in sorted(frequencies, key=str.lower)}
 
     def get_lexems(self) -> List[str]:
-        text = self.convert_pdf_to_string(self.get_file_path())
-        sentences = text.split(".")
-        words = []
-        for sentence in sentences:
-            word = sentence.split()
-            for wrd in word:
-                if (wrd not in self._ignored_lexems) and (self._is_correct_pos(wrd)) and (wrd.isalpha()):
-                    wrd = self._replace_punctuation(wrd)
-                    words.append(wrd.lower())
-        words = list(set(words))
-        words.sort(key=str.lower)
-        return words
+        return list(self.get_lexeme_frequencies())
+
+
+def count_pdf_pages(file_path: str) -> int:
+    with open(file_path, 'rb') as in_file:
+        return sum(1 for _ in PDFPage.create_pages(PDFDocument(PDFParser(in_file))))
+
+
+def iter_pdf_pages(file_path: str, first_page: int = 0, last_page: Optional[int] = None) -> Iterator[str]:
+    output_string = StringIO()
+    with open(file_path, 'rb') as in_file:
+        parser = PDFParser(in_file)
+        doc = PDFDocument(parser)
+        manager = PDFResourceManager()
+        device = TextConverter(manager, output_string, laparams=LAParams())
+        interpreter = PDFPageInterpreter(manager, device)
+        for page in islice(PDFPage.create_pages(doc), first_page, last_page):
+            interpreter.process_page(page)
+            yield output_string.getvalue()
+            output_string.seek(0)
+            output_string.truncate()
+
+
+def list_pdf_pages(file_path: str, first_page: int = 0, last_page: Optional[int] = None) -> List[str]:
+    return list(iter_pdf_pages(file_path, first_page, last_page))
@@ -0,0 +1,152 @@
+import cProfile
+import json
+import os
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Optional
+
+INSTRUMENTATION_VARIABLE = "EAZIIS_INSTRUMENTATION"  # "1" - счётчики и таймеры, "profile" - ещё и cProfile
+PROFILE_MODE = "profile"
+
+_disabled_timer = nullcontext()
+
+
+class _Timer:
+    __slots__ = ["_instrumentation", "_name", "_start"]
+
+    def __init__(self, instrumentation: "Instrumentation", name: str):
+        self._instrumentation = instrumentation
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self._instrumentation.add_time(self._name, time.perf_counter() - self._start)
+
+
+class Instrumentation:
+    # счётчики и таймеры этапов; пока сбор выключен, вызовы ничего не делают
+    def __init__(self):
+        self.enabled = False
+        self._counters = {}  # имя -> значение
+        self._timings = {}  # имя -> [число вызовов, секунды]
+        self._profiler = None
+
+    def enable(self, profile: bool = False):
+        self.enabled = True
+        if profile and self._profiler is None:
+            self._profiler = cProfile.Profile()
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        self._counters = {}
+        self._timings = {}
+        if self._profiler is not None:
+            self._profiler = cProfile.Profile()
+
+    def count(self, name: str, value: int = 1):
+        if self.enabled:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def add_time(self, name: str, seconds: float, calls: int = 1):
+        if self.enabled:
+            timing = self._timings.setdefault(name, [0, 0.0])
+            timing[0] += calls
+            timing[1] += seconds
+
+    def timer(self, name: str):
+        return _Timer(self, name) if self.enabled else _disabled_timer
+
+    def iterate(self, iterable, name: str):
+        # время получения каждого элемента без времени его обработки
+        return self._iterate_timed(iterable, name) if self.enabled else iterable
+
+    def _iterate_timed(self, iterable, name: str):
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.add_time(name, time.perf_counter() - start)
+            yield item
+
+    @contextmanager
+    def profile(self):
+        # cProfile видит только поток, в котором включён, поэтому им оборачивается работа каждого потока
+        if self._profiler is None or not self.enabled:
+            yield
+            return
+        self._profiler.enable()
+        try:
+            yield
+        finally:
+            self._profiler.disable()
+
+    def pop_data(self) -> Dict:
+        # данные процесса-обработчика для объединения в основном процессе
+        data = {"counters": self._counters, "timings": self._timings}
+        self._counters = {}
+        self._timings = {}
+        return data
+
+    def merge(self, data: Dict):
+        if not self.enabled:
+            return
+        for name, value in data["counters"].items():
+            self.count(name, value)
+        for name, (calls, seconds) in data["timings"].items():
+            self.add_time(name, seconds, calls)
+
+    def get_report(self, profile_limit: int = 30) -> Dict:
+        from ..morphology_handler.morphology_handler import get_morphology_handler
+        report = {
+            "counters": dict(sorted(self._counters.items())),
+            "timings": {name: {"calls": calls, "seconds": round(seconds, 6)}
+                        for name, (calls, seconds) in sorted(self._timings.items())},
+            "morphology_cache": get_morphology_handler().get_statistics(),
+        }
+        if self._profiler is not None:
+            report["profile"] = self._get_profile(profile_limit)
+        return report
+
+    def _get_profile(self, limit: int):
+        self._profiler.create_stats()
+        functions = sorted(self._profiler.stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+        return [{"function": f"{file_name}:{line}({name})", "calls": calls, "seconds": round(total_time, 6),
+                 "cumulative_seconds": round(cumulative_time, 6)}
+                for (file_name, line, name), (_, calls, total_time, cumulative_time, _) in functions]
+
+    def format_report(self) -> str:
+        report = self.get_report(profile_limit=10)
+        lines = [f"{name}: {value}" for name, value in report["counters"].items()]
+        lines += [f"{name}: {timing['seconds']:.3f} с / {timing['calls']}"
+                  for name, timing in report["timings"].items()]
+        lines += [f"{name}: {value}" for name, value in report["morphology_cache"].items()]
+        lines += [f"{entry['cumulative_seconds']:.3f} с {entry['function']}" for entry in report.get("profile", [])]
+        return "\n".join(lines)
+
+    def save_report(self, path: str):
+        with open(path, "w", encoding="utf-8") as report_file:
+            json.dump(self.get_report(), report_file, ensure_ascii=False, indent=1)
+
+    def save_profile(self, path: str):
+        if self._profiler is not None:
+            self._profiler.dump_stats(path)
+
+
+_instrumentation: Optional[Instrumentation] = None
+
+
+def get_instrumentation() -> Instrumentation:
+    global _instrumentation
+    if _instrumentation is None:
+        _instrumentation = Instrumentation()
+        mode = os.environ.get(INSTRUMENTATION_VARIABLE, "")
+        if mode:
+            _instrumentation.enable(profile=mode == PROFILE_MODE)
+    return _instrumentation
@@ -1,6 +1,11 @@
-from typing import Dict
+import os
+import sys
 
-import pymorphy2
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ..instrumentation.instrumentation import get_instrumentation
+from ..morphology_handler.morphology_handler import get_morphology_handler
 
 cases_representation = {"nomn": "Именительный", "gent": "Родительный", "datv": "Дательный",
                         "accs": "Винительный", "ablt": "Творительный", "loct": "Предложный"}
@@ -10,49 +15,74 @@ pos_representation = {"СУЩ": "Существительное", "ГЛ": "Гл
                       "ПРИЧ": "Причастие", "ДЕЕПР": "Деепричастие", "ЧИСЛ": "Числительное", "Н": "Наречие",
                       "МС": "Местоимение", "ЧАСТ": "Частица", "МЕЖД": "Междометие"}
 
+numbers_representation = {"sing": "Единственное", "plur": "Множественное"}
+
+PROGRESS_LEXEMES = "lexemes"
+
 
 class LexemeHandler:
+    __slots__ = ["_lexeme", "_analyzer", "_parsed", "_plural_cases", "_cases", "_current_case", "_part_of_speech",
+                 "_normal_form", "_stem", "_struct"]
+    _instrumentation = get_instrumentation()
+
     def __init__(self, lexeme: str):
         self._lexeme = lexeme
-        self._analyzer = pymorphy2.MorphAnalyzer()
+        self._analyzer = get_morphology_handler()
         self._parsed = self._analyzer.parse(lexeme)[0]
         self._plural_cases = []  # склонения во множественном числе
         self._cases = []  # склонения
         self._current_case = ""
-        self._generate_cases()
+        with self._instrumentation.timer("lexeme.cases"):
+            self._generate_cases()
         self._part_of_speech = self._analyzer.lat2cyr(self._parsed.tag.POS)  # часть речи
         self._normal_form = self._parsed.normal_form  # начальная форма
-        self._stem = self._get_stem()  # основа слова
+        with self._instrumentation.timer("lexeme.stem"):
+            self._stem = self._get_stem()  # основа слова
         self._struct = {}
         self._generate_lexeme_struct()
 
     def _generate_cases(self):
-        try:
-            for case in cases_representation.keys():
-                case_word = self._parsed.inflect({case}).word
-                self._cases.append(case_word)
-                if self._current_case == "" and case_word == self._lexeme:
-                    self._current_case = cases_representation.get(case)
+        is_parsed = self._inflect_cases(set(), self._cases)
+        is_parsed = self._inflect_cases({'plur'}, self._plural_cases) and is_parsed
+        if not is_parsed:
+            # stdout командной строки занят записями словаря
+            print("Не найдено разбора для лексемы \"" + self._lexeme + "\"", file=sys.stderr)
 
+    def _inflect_cases(self, grammemes: set, cases: list) -> bool:
+        try:
             for case in cases_representation.keys():
-                case_word = self._parsed.inflect({'plur', case}).word
-                self._plural_cases.append(case_word)
+                case_word = self._analyzer.inflect(self._lexeme, grammemes | {case}).word
+                cases.append(case_word)
                 if self._current_case == "" and case_word == self._lexeme:
                     self._current_case = cases_representation.get(case)
         except AttributeError:
-            print("Не найдено разбора для лексемы \"" + self._lexeme + "\"")
+            return False
+        return True
+
+    def get_paradigm(self) -> List[str]:
+        # формы по падежам в порядке cases_representation: сначала единственное, затем множественное число
+        # склонения из _generate_cases используются повторно: у разбора в единственном числе они совпадают
+        # с формами {'sing', падеж}, а формы множественного числа получены с теми же граммемами
+        with self._instrumentation.timer("lexeme.paradigm"):
+            singular = self._cases if 'sing' in self._parsed.tag and len(self._cases) == len(cases_representation) \
+                else self._inflect_forms({'sing'})
+            plural = self._plural_cases if len(self._plural_cases) == len(cases_representation) \
+                else self._inflect_forms({'plur'})
+            return singular + plural
+
+    def _inflect_forms(self, grammemes: set) -> List[str]:
+        forms = []
+        for case in cases_representation.keys():
+            parsed = self._analyzer.inflect(self._lexeme, grammemes | {case})
+            forms.append(parsed.word if parsed else "")
+        return forms
 
     def _get_stem(self):
-        if len(self._cases) == 1:
-            return self._cases[0]
-        if not self._cases or len(self._cases[0]) == 0:
-            return ""
-        stem = ""
-        for i in range(len(self._cases[0])):
-            for j in range(len(self._cases[0]) - i + 1):
-                if j > len(stem) and all(self._cases[0][i:i + j] in x for x in self._cases):
-                    stem = self._cases[0][i:i + j]
-        return stem
+        # формы множественного числа используются, если у лексемы нет форм единственного числа
+        forms = self._cases or self._plural_cases
+        if len(forms) == 1:
+            return forms[0]
+        return find_common_stem(forms)
 
     def _generate_lexeme_struct(self):
         if self._current_case == "":
@@ -70,8 +100,9 @@ class LexemeHandler:
         self._current_case = case_ru
         case = self._get_key_case(case_ru)
         if singular:
-            self._lexeme = self._parsed.inflect({case}).word
-        self._lexeme = self._parsed.inflect({'plur', case}).word
+            self._lexeme = self._analyzer.inflect(self._lexeme, {'sing', case}).word
+        else:
+            self._lexeme = self._analyzer.inflect(self._lexeme, {'plur', case}).word
         self._generate_lexeme_struct()
         return self.get_lexeme_struct()
 
@@ -87,3 +118,87 @@ class LexemeHandler:
     def print_lexeme_struct(self):
         for key, value in self._struct.items():
             print(f"{key}: {value}")
+
+
+# самая длинная подстрока первой формы, входящая во все формы (при равной длине - самая левая);
+# длина ищется двоичным поиском, так как любая часть общей подстроки тоже общая
+def find_common_stem(forms: List[str]) -> str:
+    if not forms or len(forms[0]) == 0:
+        return ""
+    first, others = forms[0], forms[1:]
+    low, high = 0, min(len(form) for form in forms)
+    stem = ""
+    while low < high:
+        length = (low + high + 1) // 2
+        candidate = _find_common_substring(first, others, length)
+        if candidate is None:
+            high = length - 1
+        else:
+            low, stem = length, candidate
+    return stem
+
+
+def _find_common_substring(first: str, others: List[str], length: int) -> Optional[str]:
+    for start in range(len(first) - length + 1):
+        candidate = first[start:start + length]
+        if all(candidate in form for form in others):
+            return candidate
+    return None
+
+
+_min_chunk_size = 64  # лексем в одной порции для процесса-обработчика
+
+
+def analyze_lexemes(lexemes: List[str], workers: int = 1, chunk_size: Optional[int] = None,
+                    progress: Optional[Callable[[str, int, int], None]] = None) -> List[Dict]:
+    return analyze_lexeme_paradigms(lexemes, workers, chunk_size, progress)[0]
+
+
+def analyze_lexeme_paradigms(lexemes: List[str], workers: int = 1, chunk_size: Optional[int] = None,
+                             progress: Optional[Callable[[str, int, int], None]] = None) \
+        -> Tuple[List[Dict], List[List[str]]]:
+    workers = min(workers, os.cpu_count() or 1)
+    if chunk_size is None:
+        chunk_size = max(_min_chunk_size, -(-len(lexemes) // (workers * 4)))
+    structures, paradigms = [], []
+    instrumentation = get_instrumentation()
+    instrumentation.count("lexeme.lexemes", len(lexemes))
+    if workers <= 1 or len(lexemes) <= chunk_size:
+        for lexeme in lexemes:
+            handler = LexemeHandler(lexeme)
+            structures.append(handler.get_lexeme_struct())
+            paradigms.append(handler.get_paradigm())
+            if progress:
+                progress(PROGRESS_LEXEMES, len(structures), len(lexemes))
+        return structures, paradigms
+
+    chunks = [lexemes[i:i + chunk_size] for i in range(0, len(lexemes), chunk_size)]
+    executor = ProcessPoolExecutor(max_workers=min(workers, len(chunks)), initializer=initialize_analysis_worker,
+                                   initargs=(instrumentation.enabled,))
+    try:
+        for chunk_structures, chunk_paradigms, chunk_instrumentation in executor.map(_analyze_chunk, chunks):
+            structures.extend(chunk_structures)
+            paradigms.extend(chunk_paradigms)
+            instrumentation.merge(chunk_instrumentation)
+            if progress:
+                progress(PROGRESS_LEXEMES, len(structures), len(lexemes))
+    finally:
+        executor.shutdown(cancel_futures=True)
+    return structures, paradigms
+
+
+def initialize_analysis_worker(instrumented: bool):
+    get_morphology_handler()
+    # счётчики, унаследованные от основного процесса, не должны попасть в него повторно
+    instrumentation = get_instrumentation()
+    instrumentation.reset()
+    if instrumented:
+        instrumentation.enable()
+    else:
+        instrumentation.disable()
+
+
+def _analyze_chunk(lexemes: List[str]) -> Tuple[List[Dict], List[List[str]], Dict]:
+    handlers = [LexemeHandler(lexeme) for lexeme in lexemes]
+    return [handler.get_lexeme_struct() for handler in handlers], [handler.get_paradigm() for handler in handlers], \
+        get_instrumentation().pop_data()
@@ -0,0 +1,98 @@
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+import pymorphy2
+
+from ..instrumentation.instrumentation import get_instrumentation
+
+
+class LRUCache:
+    def __init__(self, max_size: int):
+        self._max_size = max_size
+        self._items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        try:
+            value = self._items[key]
+        except KeyError:
+            self.misses += 1
+            raise
+        self._items.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        if len(self._items) > self._max_size:
+            self._items.popitem(last=False)
+
+    def clear(self):
+        self._items.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+# разбор слова вместе со склонениями занимает в кэше около 14 КБ, а кэш есть в каждом процессе разбора
+PARSE_CACHE_SIZE = 10000
+INFLECT_CACHE_SIZE = 10000
+
+
+class MorphologyHandler:
+    def __init__(self, parse_cache_size: int = PARSE_CACHE_SIZE, inflect_cache_size: int = INFLECT_CACHE_SIZE):
+        self._analyzer = pymorphy2.MorphAnalyzer()
+        self._parse_cache = LRUCache(parse_cache_size)
+        self._inflect_cache = LRUCache(inflect_cache_size)
+        self._instrumentation = get_instrumentation()
+
+    def parse(self, word: str) -> List:
+        try:
+            return self._parse_cache.get(word)
+        except KeyError:
+            with self._instrumentation.timer("morphology.parse"):
+                result = self._analyzer.parse(word)
+            self._parse_cache.put(word, result)
+            return result
+
+    def inflect(self, word: str, grammemes: Iterable[str]) -> Optional[object]:
+        key: Tuple[str, FrozenSet[str]] = (word, frozenset(grammemes))
+        try:
+            return self._inflect_cache.get(key)
+        except KeyError:
+            with self._instrumentation.timer("morphology.inflect"):
+                result = self.parse(word)[0].inflect(set(key[1]))
+            self._inflect_cache.put(key, result)
+            return result
+
+    def lat2cyr(self, grammeme: str) -> str:
+        return self._analyzer.lat2cyr(grammeme)
+
+    def get_version(self) -> str:
+        meta = self._analyzer.dictionary.meta
+        return "pymorphy2-{}/{}-{}-{}".format(pymorphy2.__version__, meta.get("language_code"),
+                                              meta.get("source_revision"), meta.get("compiled_at"))
+
+    def get_statistics(self) -> Dict[str, int]:
+        return {"parse_hits": self._parse_cache.hits, "parse_misses": self._parse_cache.misses,
+                "parse_size": len(self._parse_cache),
+                "inflect_hits": self._inflect_cache.hits, "inflect_misses": self._inflect_cache.misses,
+                "inflect_size": len(self._inflect_cache)}
+
+    def clear_cache(self):
+        self._parse_cache.clear()
+        self._inflect_cache.clear()
+
+
+_morphology_handler = None
+
+
+def get_morphology_handler() -> MorphologyHandler:
+    global _morphology_handler
+    if _morphology_handler is None:
+        _morphology_handler = MorphologyHandler()
+    return _morphology_handler
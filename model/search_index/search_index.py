@@ -0,0 +1,90 @@
+from bisect import bisect_left
+from typing import Iterable, List, Tuple
+
+_few_words = 16  # столько слов discard удаляет по одному, больше - одним проходом по списку
+
+
+class SearchIndex:
+    # упорядоченный список слов, по которому диапазонами bisect обходится неявное префиксное дерево
+    def __init__(self, words: Iterable[str] = ()):
+        self._words = sorted(set(words))
+
+    def add(self, word: str):
+        position = bisect_left(self._words, word)
+        if position == len(self._words) or self._words[position] != word:
+            self._words.insert(position, word)
+
+    def extend(self, words: Iterable[str]):
+        # новые слова упорядочиваются отдельно, а Timsort сливает два упорядоченных участка за линейное время;
+        # вставка по одному слову сдвигала бы весь список
+        added = sorted(set(words))
+        if not self._words:
+            self._words = added
+            return
+        merged = self._words + added
+        merged.sort()
+        self._words = [word for number, word in enumerate(merged) if not number or merged[number - 1] != word]
+
+    def discard(self, words: Iterable[str]):
+        removed = set(words)
+        if len(removed) <= _few_words:
+            for word in removed:
+                position = bisect_left(self._words, word)
+                if position < len(self._words) and self._words[position] == word:
+                    del self._words[position]
+        else:
+            self._words = [word for word in self._words if word not in removed]
+
+    def find_prefix(self, prefix: str, limit: int = 50) -> List[str]:
+        words = []
+        position = bisect_left(self._words, prefix)
+        while position < len(self._words) and len(words) < limit and self._words[position].startswith(prefix):
+            words.append(self._words[position])
+            position += 1
+        return words
+
+    def find_similar(self, word: str, max_distance: int = 1, limit: int = 50) -> List[Tuple[str, int]]:
+        # расстояние Левенштейна считается построчно при спуске по дереву: в строке нужны только столбцы
+        # не дальше max_distance от диагонали, а ветви, где вся полоса больше max_distance, отсекаются
+        found = []
+        if not self._words:
+            return found
+        size = len(word)
+        too_far = max_distance + 1
+        stack = [(0, len(self._words), "", list(range(size + 1)))]
+        while stack:
+            low, high, prefix, row = stack.pop()
+            depth = len(prefix) + 1
+            first, last = max(1, depth - max_distance), min(size, depth + max_distance)
+            if self._words[low] == prefix:
+                low += 1
+            while low < high:
+                char = self._words[low][depth - 1]
+                child_high = bisect_left(self._words, prefix + chr(ord(char) + 1), low, high)
+                child_row = [too_far] * (size + 1)
+                child_row[0] = min(depth, too_far)
+                best = child_row[0]
+                for column in range(first, last + 1):
+                    cost = row[column - 1] + (word[column - 1] != char)
+                    if row[column] < cost:
+                        cost = row[column] + 1
+                    if child_row[column - 1] < cost:
+                        cost = child_row[column - 1] + 1
+                    child_row[column] = cost
+                    if cost < best:
+                        best = cost
+                if best <= max_distance:
+                    child = prefix + char
+                    if child_row[size] <= max_distance and self._words[low] == child:
+                        found.append((child, child_row[size]))
+                    stack.append((low, child_high, child, child_row))
+                low = child_high
+        found.sort(key=lambda item: (item[1], item[0]))
+        return found[:limit]
+
+    def __contains__(self, word: str) -> bool:
+        position = bisect_left(self._words, word)
+        return position < len(self._words) and self._words[position] == word
+
+    def __len__(self) -> int:
+        return len(self._words)
@@ -0,0 +1,360 @@
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from cli import expand_documents, to_record
+from model.dictionary_exporter.dictionary_exporter import LEXEME_FIELD
+from model.dictionary_handler.dictionary_handler import DictionaryHandler, FUZZY_MAX_DISTANCE, NUMBER_PROPERTY, \
+    TOP_LEXEMES_COUNT, search_kinds
+from model.dictionary_store.dictionary_store import CASE_PROPERTY
+from model.instrumentation.instrumentation import get_instrumentation
+from model.lexeme_handler.lexeme_handler import LexemeHandler, cases_representation, initialize_analysis_worker, \
+    numbers_representation
+from model.morphology_handler.morphology_handler import get_morphology_handler
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+PARADIGM_FIELD = "Парадигма"
+WORDFORM_FIELD = "Словоформа"
+ERROR_FIELD = "Ошибка"
+MAX_BODY_SIZE = 64 << 20  # наибольший размер загружаемого PDF
+MAX_LEXEMES_PER_REQUEST = 1000
+
+_reasons = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 409: "Conflict",
+            413: "Payload Too Large", 415: "Unsupported Media Type", 500: "Internal Server Error"}
+
+
+class ServiceError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class AnalysisBatcher:
+    # одновременные запросы разбора собираются в пакет и целиком отправляются в один процесс-обработчик
+    def __init__(self, executor: ProcessPoolExecutor, batch_size: int, batch_delay: float):
+        self._executor = executor
+        self._batch_size = batch_size
+        self._batch_delay = batch_delay
+        self._pending = {}  # лексема -> future; одинаковые лексемы в пакете разбираются один раз
+        self._timer = None
+        self.batches = 0
+        self.lexemes = 0
+
+    def analyze(self, lexeme: str) -> asyncio.Future:
+        future = self._pending.get(lexeme)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._pending[lexeme] = future
+            if len(self._pending) >= self._batch_size:
+                self._flush()
+            elif self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(self._batch_delay, self._flush)
+        return future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        self.batches += 1
+        self.lexemes += len(pending)
+        batch = asyncio.get_running_loop().run_in_executor(self._executor, _analyze_batch, list(pending))
+        batch.add_done_callback(partial(self._resolve, pending))
+
+    @staticmethod
+    def _resolve(pending: Dict[str, asyncio.Future], batch: asyncio.Future):
+        if batch.exception() is not None:
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(batch.exception())
+            return
+        results, instrumentation = batch.result()
+        get_instrumentation().merge(instrumentation)
+        for future, result in zip(pending.values(), results):
+            if not future.done():
+                future.set_result(result)
+
+    def get_statistics(self) -> Dict:
+        return {"batches": self.batches, "lexemes": self.lexemes,
+                "mean_batch_size": round(self.lexemes / self.batches, 2) if self.batches else 0}
+
+
+class AnalysisService:
+    def __init__(self, documents: List[str], use_cache: bool = True, workers: int = 1, batch_size: int = 32,
+                 batch_delay: float = 0.002, upload_dir: Optional[str] = None):
+        self._documents = documents
+        self._use_cache = use_cache
+        self._workers = workers
+        self._upload_dir = upload_dir or tempfile.mkdtemp(prefix="eaziis_uploads_")
+        os.makedirs(self._upload_dir, exist_ok=True)
+        self._uploads = 0
+        self._handler: Optional[DictionaryHandler] = None
+        self._dictionary_lock = asyncio.Lock()  # загрузка документа не должна идти одновременно с поиском
+        self._executor = ProcessPoolExecutor(max_workers=workers, initializer=initialize_analysis_worker,
+                                             initargs=(get_instrumentation().enabled,))
+        self._batcher = AnalysisBatcher(self._executor, batch_size, batch_delay)
+        self._routes = {
+            ("GET", "/health"): self.health,
+            ("POST", "/analyze"): self.analyze,
+            ("POST", "/wordform"): self.wordform,
+            ("GET", "/search"): self.search,
+            ("GET", "/top"): self.top,
+            ("POST", "/documents"): self.upload_document,
+            ("GET", "/stats"): self.statistics,
+        }
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        # анализатор в процессах загружается заранее, чтобы первые запросы не ждали его
+        await asyncio.gather(*(loop.run_in_executor(self._executor, _analyze_batch, [])
+                               for _ in range(self._workers)))
+        get_morphology_handler()
+        if self._documents:
+            self._handler = await loop.run_in_executor(
+                None, lambda: DictionaryHandler(self._documents[0], use_cache=self._use_cache, workers=self._workers,
+                                                corpus=self._documents[1:]))
+
+    def close(self):
+        self._executor.shutdown(cancel_futures=True)
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY_SIZE:
+                    writer.write(_format_response(413, {"error": "Слишком большой запрос"}, False))
+                    break
+                body = await reader.readexactly(length) if length else b""
+                status, payload = await self.dispatch(method, target, headers, body)
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                writer.write(_format_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method: str, target: str, headers: Dict[str, str], body: bytes) -> Tuple[int, Dict]:
+        url = urlsplit(target)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        try:
+            if url.path.startswith("/documents/") and method == "DELETE":
+                return 200, await self.remove_document(url.path[len("/documents/"):])
+            route = self._routes.get((method, url.path))
+            if route is None:
+                if any(path == url.path for _, path in self._routes):
+                    raise ServiceError(405, "Метод " + method + " не поддерживается")
+                raise ServiceError(404, "Нет такого адреса: " + url.path)
+            if url.path == "/documents":
+                return 200, await route(query, headers, body)
+            return 200, await route(query, _parse_json(body) if body else {})
+        except ServiceError as error:
+            return error.status, {"error": str(error)}
+        except Exception as error:
+            return 500, {"error": repr(error)}
+
+    async def health(self, query: Dict, request: Dict) -> Dict:
+        return {"status": "ok", "dictionary": len(self._handler.get_dictionary()) if self._handler else 0,
+                "documents": self._handler.get_document_ids() if self._handler else {}}
+
+    async def analyze(self, query: Dict, request: Dict) -> Dict:
+        lexemes = request.get("lexemes") or ([request["lexeme"]] if "lexeme" in request else [])
+        if not isinstance(lexemes, list) or not lexemes or \
+                not all(isinstance(lexeme, str) and lexeme for lexeme in lexemes):
+            raise ServiceError(400, "Укажите \"lexeme\" или непустой список \"lexemes\"")
+        if len(lexemes) > MAX_LEXEMES_PER_REQUEST:
+            raise ServiceError(413, "Не больше {} лексем в запросе".format(MAX_LEXEMES_PER_REQUEST))
+        results = await asyncio.gather(*(self._batcher.analyze(lexeme.lower()) for lexeme in lexemes))
+        records = []
+        for lexeme, result in zip(lexemes, results):
+            if result is None:
+                records.append({LEXEME_FIELD: lexeme, ERROR_FIELD: "Не найдено разбора"})
+                continue
+            structure, paradigm = result
+            record = to_record(structure)
+            record[PARADIGM_FIELD] = paradigm
+            records.append(record)
+        return {"results": records}
+
+    async def wordform(self, query: Dict, request: Dict) -> Dict:
+        lexeme = request.get("lexeme")
+        case = request.get("case")
+        singular = request.get("singular", True)
+        if not isinstance(lexeme, str) or not lexeme:
+            raise ServiceError(400, "Укажите \"lexeme\"")
+        if case not in cases_representation.values():
+            raise ServiceError(400, "Падеж должен быть одним из: " + ", ".join(cases_representation.values()))
+        if not isinstance(singular, bool):
+            raise ServiceError(400, "Поле \"singular\" должно быть true или false")
+        result = await self._batcher.analyze(lexeme.lower())
+        slot = list(cases_representation.values()).index(case) + (0 if singular else len(cases_representation))
+        if result is None or not result[1][slot]:
+            raise ServiceError(404, "Словоформа для \"" + lexeme + "\" не найдена")
+        return {LEXEME_FIELD: lexeme, WORDFORM_FIELD: result[1][slot], CASE_PROPERTY: case,
+                NUMBER_PROPERTY: list(numbers_representation.values())[0 if singular else 1]}
+
+    async def search(self, query: Dict, request: Dict) -> Dict:
+        handler = self._get_handler()
+        if not query.get("q"):
+            raise ServiceError(400, "Укажите запрос в параметре q")
+        kind = query.get("by")
+        if kind is not None and kind not in search_kinds:
+            raise ServiceError(400, "Тип поиска должен быть одним из: " + ", ".join(search_kinds))
+        distance = _get_int(query, "distance", FUZZY_MAX_DISTANCE)
+        async with self._dictionary_lock:
+            found_kind, structures = await asyncio.get_running_loop().run_in_executor(
+                None, handler.search, query["q"], kind, distance)
+        return {"kind": found_kind, "results": [to_record(structure) for structure in structures]}
+
+    async def top(self, query: Dict, request: Dict) -> Dict:
+        handler = self._get_handler()
+        document_id = _get_int(query, "document", None)
+        async with self._dictionary_lock:
+            if document_id is not None and document_id not in handler.get_document_ids():
+                raise ServiceError(404, "Нет документа с номером {}".format(document_id))
+            top = handler.get_top_lexemes(_get_int(query, "n", TOP_LEXEMES_COUNT), document_id)
+        return {"results": [to_record(structure, Частота=frequency) for structure, frequency in top]}
+
+    async def upload_document(self, query: Dict, headers: Dict[str, str], body: bytes) -> Dict:
+        # тело запроса - сам PDF-файл
+        if not body.startswith(b"%PDF"):
+            raise ServiceError(415, "Ожидается PDF-документ в теле запроса")
+        self._uploads += 1
+        name = os.path.basename(query.get("name", "")) or "upload.pdf"
+        path = os.path.join(self._upload_dir, "{}_{}".format(self._uploads, name))
+        with open(path, "wb") as upload_file:
+            upload_file.write(body)
+        loop = asyncio.get_running_loop()
+        async with self._dictionary_lock:
+            if self._handler is None:
+                self._handler = await loop.run_in_executor(
+                    None, lambda: DictionaryHandler(path, use_cache=self._use_cache, workers=self._workers))
+                document_id = next(iter(self._handler.get_document_ids()))
+            else:
+                document_id = await loop.run_in_executor(None, self._handler.append_document, path)
+            lexemes = len(self._handler.get_document_lexemes(document_id))
+            size = len(self._handler.get_dictionary())
+        return {"document": document_id, "path": path, "lexemes": lexemes, "dictionary": size}
+
+    async def remove_document(self, document: str) -> Dict:
+        handler = self._get_handler()
+        try:
+            document_id = int(document)
+        except ValueError:
+            raise ServiceError(400, "Номер документа должен быть числом")
+        async with self._dictionary_lock:
+            if document_id not in handler.get_document_ids():
+                raise ServiceError(404, "Нет документа с номером {}".format(document_id))
+            await asyncio.get_running_loop().run_in_executor(None, handler.remove_document, document_id)
+            return {"document": document_id, "dictionary": len(handler.get_dictionary())}
+
+    async def statistics(self, query: Dict, request: Dict) -> Dict:
+        statistics = {"batching": self._batcher.get_statistics()}
+        if get_instrumentation().enabled:
+            statistics["instrumentation"] = get_instrumentation().get_report()
+        return statistics
+
+    def _get_handler(self) -> DictionaryHandler:
+        if self._handler is None:
+            raise ServiceError(409, "Словарь пуст: загрузите PDF-документ через POST /documents")
+        return self._handler
+
+
+def _analyze_batch(lexemes: List[str]) -> Tuple[List[Optional[Tuple[Dict, List[str]]]], Dict]:
+    results = []
+    for lexeme in lexemes:
+        try:
+            handler = LexemeHandler(lexeme)
+            results.append((handler.get_lexeme_struct(), handler.get_paradigm()))
+        except AttributeError:
+            results.append(None)
+    return results, get_instrumentation().pop_data()
+
+
+def _parse_json(body: bytes) -> Dict:
+    try:
+        request = json.loads(body.decode("utf-8"))
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        raise ServiceError(400, "Тело запроса должно быть JSON-объектом")
+    if not isinstance(request, dict):
+        raise ServiceError(400, "Тело запроса должно быть JSON-объектом")
+    return request
+
+
+def _get_int(query: Dict, name: str, default: Optional[int]) -> Optional[int]:
+    if name not in query:
+        return default
+    try:
+        return int(query[name])
+    except ValueError:
+        raise ServiceError(400, "Параметр " + name + " должен быть числом")
+
+
+def _format_response(status: int, payload: Dict, keep_alive: bool) -> bytes:
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    head = "HTTP/1.1 {} {}\r\nContent-Type: application/json; charset=utf-8\r\nContent-Length: {}\r\n" \
+           "Connection: {}\r\n\r\n".format(status, _reasons.get(status, ""), len(body),
+                                           "keep-alive" if keep_alive else "close")
+    return head.encode("latin-1") + body
+
+
+async def serve(args):
+    service = AnalysisService(expand_documents(args.documents), use_cache=not args.no_cache, workers=args.workers,
+                              batch_size=args.batch_size, batch_delay=args.batch_delay / 1000,
+                              upload_dir=args.upload_dir)
+    try:
+        await service.start()
+        server = await asyncio.start_server(service.handle_connection, args.host, args.port)
+        print("Служба словаря запущена на http://{}:{}".format(args.host, args.port), flush=True)
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def create_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Локальная HTTP/JSON-служба разбора лексем и поиска по словарю")
+    parser.add_argument("documents", nargs="*", help="PDF-документы или шаблоны вида texts/*.pdf для словаря")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="число процессов для разбора")
+    parser.add_argument("--batch-size", type=int, default=32, help="наибольшее число лексем в пакете разбора")
+    parser.add_argument("--batch-delay", type=float, default=2.0,
+                        help="сколько миллисекунд ждать другие запросы перед отправкой пакета")
+    parser.add_argument("--upload-dir", help="каталог для загруженных PDF; по умолчанию временный")
+    parser.add_argument("--no-cache", action="store_true", help="не использовать кэш словарей на диске")
+    return parser
+
+
+def main(argv=None):
+    args = create_parser().parse_args(argv)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import tkinter as tk
+from tkinter import ttk
+from typing import Dict, Iterable, List
+
+from model.dictionary_store.dictionary_store import POS_PROPERTY, NORMAL_FORM_PROPERTY, STEM_PROPERTY, \
+    CASE_PROPERTY
+
+columns_representation = {"number": "№", "lexeme": "Лексема", POS_PROPERTY: POS_PROPERTY,
+                          NORMAL_FORM_PROPERTY: NORMAL_FORM_PROPERTY, STEM_PROPERTY: STEM_PROPERTY,
+                          CASE_PROPERTY: CASE_PROPERTY, "other": "Прочее"}
+columns_width = {"number": 60, "lexeme": 180, POS_PROPERTY: 160, NORMAL_FORM_PROPERTY: 180,
+                 STEM_PROPERTY: 160, CASE_PROPERTY: 130, "other": 230}
+
+
+class DictionaryView:
+    # отрисовываются только видимые строки; прокрутка меняет смещение окна, а не число элементов Treeview
+    def __init__(self, master, visible_rows: int = 40):
+        self._frame = tk.Frame(master)
+        self._visible_rows = visible_rows
+        self._tree = ttk.Treeview(self._frame, columns=list(columns_representation), show="headings",
+                                  height=visible_rows, selectmode="browse")
+        self._scrollbar = ttk.Scrollbar(self._frame, orient=tk.VERTICAL, command=self._on_scroll)
+        self._entries = []
+        self._offset = 0
+        self._rendered_count = 0  # сколько записей было при последней отрисовке
+        for column, title in columns_representation.items():
+            self._tree.heading(column, text=title)
+            self._tree.column(column, width=columns_width[column], stretch=column == "other")
+        for row in range(visible_rows):
+            self._tree.insert("", tk.END, iid=self._get_row_id(row), values=())
+        self._tree.bind("<MouseWheel>", self._on_mouse_wheel)
+        self._tree.bind("<Button-4>", lambda _: self.scroll_to(self._offset - 3))
+        self._tree.bind("<Button-5>", lambda _: self.scroll_to(self._offset + 3))
+
+    def grid(self, **kwargs):
+        self._frame.rowconfigure(0, weight=1)
+        self._frame.columnconfigure(0, weight=1)
+        self._tree.grid(row=0, column=0, sticky="nsew")
+        self._scrollbar.grid(row=0, column=1, sticky="ns")
+        self._frame.grid(**kwargs)
+
+    def set_entries(self, entries: List[Dict]):
+        self._entries = entries
+        self._offset = 0
+        self.refresh()
+
+    def refresh(self):
+        self.scroll_to(self._offset)
+
+    def refresh_rows(self, positions: Iterable[int]):
+        for position in positions:
+            if self._offset <= position < self._offset + self._visible_rows:
+                self._render_row(position - self._offset)
+        self._update_scrollbar()
+
+    def refresh_appended(self):
+        start = max(self._rendered_count, self._offset)
+        self.refresh_rows(range(start, min(len(self._entries), self._offset + self._visible_rows)))
+
+    def scroll_to(self, offset: int):
+        self._offset = max(0, min(offset, len(self._entries) - self._visible_rows))
+        for row in range(self._visible_rows):
+            self._render_row(row)
+        self._update_scrollbar()
+
+    def _render_row(self, row: int):
+        position = self._offset + row
+        if position >= len(self._entries):
+            self._tree.item(self._get_row_id(row), values=())
+            return
+        self._tree.item(self._get_row_id(row), values=get_row_values(position + 1, self._entries[position]))
+
+    def _update_scrollbar(self):
+        self._rendered_count = len(self._entries)
+        if not self._entries:
+            self._scrollbar.set(0, 1)
+            return
+        total = len(self._entries)
+        self._scrollbar.set(self._offset / total, min(1.0, (self._offset + self._visible_rows) / total))
+
+    def _on_scroll(self, action, value, unit=None):
+        if action == tk.MOVETO:
+            self.scroll_to(int(float(value) * len(self._entries)))
+        elif action == tk.SCROLL:
+            step = self._visible_rows if unit == tk.PAGES else 1
+            self.scroll_to(self._offset + int(value) * step)
+
+    def _on_mouse_wheel(self, event):
+        self.scroll_to(self._offset - int(event.delta / 120) * 3)
+
+    @staticmethod
+    def _get_row_id(row: int) -> str:
+        return "row" + str(row)
+
+
+def get_row_values(number: int, structure: Dict) -> List:
+    lexeme, struct = next(iter(structure.items()))
+    other = ", ".join(f"{prop}: {value}" for prop, value in struct.items() if prop not in columns_representation)
+    return [number, lexeme, struct.get(POS_PROPERTY, ""), struct.get(NORMAL_FORM_PROPERTY, ""),
+            struct.get(STEM_PROPERTY, ""), struct.get(CASE_PROPERTY, ""), other]
@@ -1,21 +1,34 @@
+import os
+import queue
 import threading
 import tkinter as tk
-from idlelib.redirector import WidgetRedirector
-from tkinter import simpledialog, messagebox
+from tkinter import simpledialog, messagebox, ttk
 from tkinter.filedialog import askopenfilename
 
 from model import document_handler
-from model.dictionary_handler.dictionary_handler import DictionaryHandler, remove_structure_symbols
-from model.document_handler.document_handler import DocumentHandler
-from model.lexeme_handler.lexeme_handler import pos_representation, cases_representation
-from fpdf import FPDF
+from model.dictionary_handler.dictionary_handler import DictionaryHandler, remove_structure_symbols, \
+    SEARCH_BY_LEXEME, SEARCH_BY_POS, SEARCH_BY_CASE, SEARCH_BY_NORMAL_FORM, SEARCH_BY_WORDFORM, SEARCH_BY_STEM, \
+    SEARCH_BY_PREFIX, SEARCH_FUZZY, format_structure
+from model.document_handler.document_handler import DocumentHandler, PROGRESS_PAGES
+from model.instrumentation.instrumentation import get_instrumentation
+from model.lexeme_handler.lexeme_handler import PROGRESS_LEXEMES
+from view.dictionary_view import DictionaryView
+
+progress_representation = {PROGRESS_PAGES: "Страницы", PROGRESS_LEXEMES: "Лексемы"}
+search_titles = {SEARCH_BY_STEM: "Основа слова", SEARCH_BY_PREFIX: "Начало слова", SEARCH_FUZZY: "Похожие на"}
+
+
+class JobCancelled(Exception):
+    pass
 
 
 class MainWindow:
+    _poll_interval = 100  # мс между проверками очереди фоновой задачи
+
     def __init__(self):
         self._window = tk.Tk()
         self._is_window_opened = False
-        self._txt_edit = tk.Text(self._window)
+        self._dictionary_view = DictionaryView(self._window)
         self._dictionary_documentation_txt_edit = tk.Text(self._window)
         self._frame_buttons = tk.Frame(self._window)
         self._dictionary_documentation_label = tk.Label(self._window, text="Документирование словаря")
@@ -32,7 +45,16 @@ class MainWindow:
                                           command=self.generate)
         self._button_help = tk.Button(self._frame_buttons, text="Помощь",
                                       command=self.about)
+        self._progress_label = tk.Label(self._frame_buttons, text="")
+        self._progress_bar = ttk.Progressbar(self._frame_buttons, mode="determinate")
+        self._button_cancel = tk.Button(self._frame_buttons, text="Отмена", command=self.cancel, state=tk.DISABLED)
+        self._job_buttons = [self._button_open, self._button_append, self._button_save, self._button_search,
+                             self._button_add, self._button_edit, self._button_generate]
+        self._jobs = queue.Queue()  # сообщения фоновой задачи для главного потока
+        self._cancel_event = threading.Event()
+        self._is_busy = False
         self._handler = DictionaryHandler
+        self._instrumentation = get_instrumentation()
 
     def start(self):
         self._configure_window()
@@ -50,16 +72,15 @@ class MainWindow:
         self._button_generate.grid(row=5, column=0, sticky="ew", padx=5, pady=5)
         self._button_help.grid(row=6, column=0, sticky="ew", padx=5, pady=5)
         self._button_save.grid(row=7, column=0, sticky="ew", padx=5, pady=5)
+        self._progress_label.grid(row=8, column=0, sticky="ew", padx=5)
+        self._progress_bar.grid(row=9, column=0, sticky="ew", padx=5, pady=5)
+        self._button_cancel.grid(row=10, column=0, sticky="ew", padx=5, pady=5)
         self._frame_buttons.grid(row=0, column=0, sticky="ns")
-        self._txt_edit.grid(row=0, column=1, rowspan=3, sticky="nsew")
+        self._dictionary_view.grid(row=0, column=1, rowspan=3, sticky="nsew")
         self._dictionary_documentation_label.grid(row=1, column=0, ipady=5)
         self._dictionary_documentation_txt_edit.grid(row=2, column=0, sticky="e", ipady=5)
         self._dictionary_documentation_txt_edit.configure(width=30, borderwidth=10)
-
-        # readonly text field
-        self._txt_edit.redirector = WidgetRedirector(self._txt_edit)
-        self._txt_edit.insert = self._txt_edit.redirector.register("insert", lambda *args, **kw: "break")
-        self._txt_edit.delete = self._txt_edit.redirector.register("delete", lambda *args, **kw: "break")
+        self._window.after(self._poll_interval, self._poll_jobs)
 
     def open_file(self):
         filepath = askopenfilename(
@@ -67,9 +88,11 @@ class MainWindow:
         )
         if not filepath:
             return
-        self._handler = DictionaryHandler(filepath)
-        content = self._handler.get_full_dictionary_string(self._handler.get_dictionary())
-        self._refill_txt_edit(content)
+        self._run_job(lambda: DictionaryHandler(filepath, progress=self._report_progress), self._on_file_opened)
+
+    def _on_file_opened(self, handler: DictionaryHandler):
+        self._handler = handler
+        self._dictionary_view.set_entries(self._handler.get_dictionary())
         self._is_window_opened = True
 
     def append_file(self):
@@ -81,9 +104,20 @@ class MainWindow:
         )
         if not filepath:
             return
-        self._handler.append_document(filepath)
-        content = self._handler.get_full_dictionary_string(self._handler.get_dictionary())
-        self._refill_txt_edit(content)
+        # разбор идёт в фоновом потоке, а словарь, который читает таблица, меняется только в главном
+        self._run_job(lambda: self._handler.analyze_documents([filepath]), self._on_documents_analyzed)
+
+    def _on_documents_analyzed(self, analyzed):
+        self._handler.apply_documents(analyzed)
+        self._on_dictionary_changed()
+
+    def _on_wordform_generated(self, wordform):
+        if wordform is not None:
+            self._handler.add_wordform(*wordform)
+        self._on_dictionary_changed()
+
+    def _on_dictionary_changed(self, _=None):
+        self._dictionary_view.refresh_appended()
 
     def search(self):
         if not self._is_window_opened:
@@ -93,19 +127,26 @@ class MainWindow:
                                        parent=self._window)
         if not query:
             return
-        normal_form = self._handler.get_lexeme_structure_by_normal_form(query)
-        if self._handler.get_lexeme_structure(query):
+        kind, structures = self._handler.search(query)
+        if kind == SEARCH_BY_LEXEME:
             messagebox.showinfo("Информация о \"" + query + " \"",
                                 remove_structure_symbols(str(self._handler.get_lexeme_structure(query))))
-        elif query in list(pos_representation.values()):
+        elif kind == SEARCH_BY_POS:
             messagebox.showinfo("Лексемы части речи \"" + query + "\"",
                                 self._handler.get_lexeme_structures_by_pos(query))
-        elif query in list(cases_representation.values()):
+        elif kind == SEARCH_BY_CASE:
             messagebox.showinfo("Лексемы падежа \"" + query + "\"",
                                 self._handler.get_lexeme_structures_by_case(query))
-        elif normal_form:
+        elif kind == SEARCH_BY_NORMAL_FORM:
             messagebox.showinfo("Начальная форма \"" + query + "\"",
-                                normal_form)
+                                self._handler.get_lexeme_structure_by_normal_form(query))
+        elif kind == SEARCH_BY_WORDFORM:
+            messagebox.showinfo("Словоформа \"" + query + "\"",
+                                "\n".join(format_structure(structure) for structure in structures))
+        elif kind in search_titles:
+            messagebox.showinfo(search_titles[kind] + " \"" + query + "\"",
+                                "\n".join(str(number) + ". " + format_structure(structure)
+                                          for number, structure in enumerate(structures, 1)))
         else:
             messagebox.showwarning("Внимание", "Лексема \"" + query + "\" не найдена")
 
@@ -120,8 +161,7 @@ class MainWindow:
             messagebox.showinfo("Лексема \"" + lexeme + "\" добавлена",
                                 remove_structure_symbols(str(self._handler.get_lexeme_structure(lexeme))))
 
-            content = self._handler.get_full_dictionary_string(self._handler.get_dictionary())
-            self._refill_txt_edit(content)
+            self._dictionary_view.refresh_appended()
         except AttributeError:
             messagebox.showerror("Ошибка", "Лексема \"" + lexeme + "\" не найдена")
 
@@ -156,12 +196,15 @@ class MainWindow:
         edit_window.mainloop()
 
     def edit_lexeme(self, entry_lexeme, entry_prop, entry_value):
+        if self._is_busy:
+            return
         lexeme = entry_lexeme.get()
         prop = entry_prop.get()
         value = entry_value.get()
         self._handler.edit_lexeme_structure(lexeme, prop, value)
-        content = self._handler.get_full_dictionary_string(self._handler.get_dictionary())
-        self._refill_txt_edit(content)
+        position = self._handler.get_lexeme_position(lexeme)
+        if position is not None:
+            self._dictionary_view.refresh_rows([position])
 
     def generate(self):
         if not self._is_window_opened:
@@ -201,31 +244,90 @@ class MainWindow:
             singular = True
         else:
             singular = False
-        self._handler.generate_wordform(lexeme, case, singular)
-        content = self._handler.get_full_dictionary_string(self._handler.get_dictionary())
-        self._refill_txt_edit(content)
-
-    def _refill_txt_edit(self, content: str):
-        self._txt_edit.delete("1.0", tk.END)
-        self._txt_edit.insert(tk.END, content)
+        self._run_job(lambda: self._handler.prepare_wordform(lexeme, case, singular), self._on_wordform_generated)
 
     @staticmethod
     def run_on_new_thread(function):
-        threading.Thread(target=function).start()
+        threading.Thread(target=function, daemon=True).start()
+
+    def _run_job(self, work, on_done):
+        if self._is_busy:
+            return
+        self._is_busy = True
+        self._cancel_event.clear()
+        for button in self._job_buttons:
+            button.configure(state=tk.DISABLED)
+        self._button_cancel.configure(state=tk.NORMAL)
+        self._progress_label.configure(text="Выполняется...")
+        self._progress_bar.configure(value=0)
+        self.run_on_new_thread(lambda: self._execute_job(work, on_done))
+
+    def _execute_job(self, work, on_done):
+        try:
+            with self._instrumentation.profile():
+                result = work()
+        except JobCancelled:
+            self._jobs.put(("cancelled", None))
+        except Exception as error:
+            self._jobs.put(("error", error))
+        else:
+            self._jobs.put(("done", (on_done, result)))
+
+    def _report_progress(self, stage: str, done: int, total: int):
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+        self._jobs.put(("progress", (stage, done, total)))
+
+    def cancel(self):
+        self._cancel_event.set()
+        self._progress_label.configure(text="Отмена...")
+
+    def _poll_jobs(self):
+        try:
+            while True:
+                kind, payload = self._jobs.get_nowait()
+                if kind == "progress":
+                    self._show_progress(*payload)
+                else:
+                    self._finish_job(kind, payload)
+        except queue.Empty:
+            pass
+        self._window.after(self._poll_interval, self._poll_jobs)
+
+    def _show_progress(self, stage: str, done: int, total: int):
+        self._progress_label.configure(text=f"{progress_representation.get(stage, stage)}: {done} из {total}")
+        self._progress_bar.configure(maximum=max(total, 1), value=done)
+
+    def _finish_job(self, kind: str, payload):
+        self._is_busy = False
+        for button in self._job_buttons:
+            button.configure(state=tk.NORMAL)
+        self._button_cancel.configure(state=tk.DISABLED)
+        self._progress_bar.configure(value=0)
+        self._progress_label.configure(text="Отменено" if kind == "cancelled" else "")
+        if kind == "done":
+            on_done, result = payload
+            on_done(result)
+        elif kind == "error":
+            messagebox.showerror("Ошибка", str(payload))
+        self._show_statistics()
+
+    def _show_statistics(self):
+        if not self._instrumentation.enabled:
+            return
+        self._dictionary_documentation_txt_edit.delete("1.0", tk.END)
+        self._dictionary_documentation_txt_edit.insert("1.0", self._instrumentation.format_report())
 
     @staticmethod
     def about():
         messagebox.showinfo("Помощь",
                             "Для начала работы откройте файл.\nФормат PDF.\nЯзык русский.\nВозможности поиска:"
-                            " запись по лексеме или основе слова, поиск всех лексем по падежу, по части речи.")
+                            " запись по лексеме или основе слова, поиск всех лексем по падежу, по части речи,"
+                            " по началу слова (запрос вида \"дом*\"), поиск похожих слов при опечатке.")
 
     def save_file(self):
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.add_font("Arial", "", "arial.ttf", uni=True)
-        pdf.set_font("Arial", size=8)
-        sentence = (self._handler.get_full_dictionary_string(self._handler.get_dictionary())).split("\n")
-        path = self._handler.get_document().get_file_path().split("\\")
-        for i in sentence:
-            pdf.cell(0, 5, i, ln=1)
-        pdf.output(f"write_{path[-1]}")
+        if not self._is_window_opened:
+            messagebox.showerror("Ошибка сохранения", "Для начала откройте файл")
+            return
+        path = os.path.basename(self._handler.get_document().get_file_path())
+        self._run_job(lambda: self._handler.export(f"write_{path}", "pdf"), lambda _: None)